@@ -67,10 +67,13 @@ create_tables() {
         --table-name patients-$environment \
         --attribute-definitions \
             AttributeName=id,AttributeType=S \
+            AttributeName=entity_type,AttributeType=S \
+            AttributeName=created_at,AttributeType=S \
         --key-schema \
             AttributeName=id,KeyType=HASH \
-        --provisioned-throughput \
-            ReadCapacityUnits=5,WriteCapacityUnits=5 \
+        --global-secondary-indexes \
+            "IndexName=active-index,KeySchema=[{AttributeName=entity_type,KeyType=HASH},{AttributeName=created_at,KeyType=RANGE}],Projection={ProjectionType=ALL}" \
+        --billing-mode PAY_PER_REQUEST \
         --tags Key=Environment,Value=$environment || true
     
     # Create patient progress table
@@ -82,8 +85,7 @@ create_tables() {
         --key-schema \
             AttributeName=patient_id,KeyType=HASH \
             AttributeName=timestamp,KeyType=RANGE \
-        --provisioned-throughput \
-            ReadCapacityUnits=5,WriteCapacityUnits=5 \
+        --billing-mode PAY_PER_REQUEST \
         --tags Key=Environment,Value=$environment || true
 }
 
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+import boto3
+import logging
+from datetime import datetime, timezone
+from boto3.dynamodb.conditions import Attr
+from config import config
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def backfill_patient_index(table_name: str = 'patients') -> int:
+    """Add entity_type/created_at to patients written before the active-index GSI existed"""
+    dynamodb = boto3.resource(
+        'dynamodb',
+        endpoint_url=config.get('database.endpoint'),
+        region_name=config.get('database.region', 'us-west-2')
+    )
+    table = dynamodb.Table(table_name)
+    now = datetime.now(timezone.utc).isoformat()
+
+    updated = 0
+    scan_kwargs = {
+        'FilterExpression': Attr('entity_type').not_exists(),
+        'ProjectionExpression': 'id'
+    }
+    while True:
+        response = table.scan(**scan_kwargs)
+        for item in response.get('Items', []):
+            table.update_item(
+                Key={'id': item['id']},
+                UpdateExpression='SET entity_type = :e, created_at = if_not_exists(created_at, :c)',
+                ExpressionAttributeValues={':e': 'patient', ':c': now}
+            )
+            updated += 1
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    logger.info(f"Backfilled {updated} patients in {table_name}")
+    return updated
+
+if __name__ == '__main__':
+    backfill_patient_index()
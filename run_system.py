@@ -71,6 +71,7 @@ class SystemManager:
         
         logger.info("Stopping system...")
         self.running = False
+        self.monitor.stop_resource_monitoring()
         
         # Additional cleanup if needed
         logger.info("System stopped")
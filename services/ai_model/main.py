@@ -1,11 +1,14 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import tensorflow as tf
+import os
 import boto3
+from botocore.config import Config
 import pandas as pd
 from services.utils.logging import setup_logging
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 logger = setup_logging()
 
 # Add CORS middleware
@@ -17,7 +20,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-s3 = boto3.client('s3')
+s3 = boto3.client(
+    's3',
+    config=Config(
+        region_name=os.getenv('AWS_REGION'),
+        max_pool_connections=64,
+        tcp_keepalive=True,
+        retries={'mode': 'adaptive', 'max_attempts': 5},
+        s3={'addressing_style': 'virtual'}
+    )
+)
 
 def create_model(input_shape):
     model = tf.keras.Sequential([
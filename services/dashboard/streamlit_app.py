@@ -1,12 +1,17 @@
 import streamlit as st
 import requests
 import json
+import numpy as np
 import pandas as pd
-import plotly.express as px
+import plotly.graph_objects as go
+import threading
+from concurrent.futures import Future
 from datetime import datetime
+from urllib.parse import quote
 
 # Configuration
 API_BASE_URL = "http://localhost:8087"  # Updated port
+PATIENT_PAGE_SIZE = 1000  # the API's maximum page size
 
 # Page config
 st.set_page_config(
@@ -18,18 +23,76 @@ st.set_page_config(
 st.sidebar.title("Navigation")
 page = st.sidebar.radio("Go to", ["Dashboard", "Patient Management", "Treatment Analysis", "Progress Tracking"])
 
+@st.cache_resource
+def _inflight_requests():
+    """Registry of in-flight GET requests shared by all sessions"""
+    return {}, threading.Lock()
+
+def _shared_get(url):
+    """GET a URL, sharing one response between concurrent identical requests"""
+    inflight, lock = _inflight_requests()
+    with lock:
+        future = inflight.get(url)
+        is_owner = future is None
+        if is_owner:
+            future = inflight[url] = Future()
+    
+    if is_owner:
+        try:
+            future.set_result(requests.get(url))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with lock:
+                inflight.pop(url, None)
+    
+    return future.result()
+
 def fetch_patients():
-    """Fetch patients from the API"""
+    """Fetch every patient from the API, following the page cursor"""
+    patients = []
+    cursor = None
     try:
-        response = requests.get(f"{API_BASE_URL}/patients")
+        while True:
+            url = f"{API_BASE_URL}/patients?limit={PATIENT_PAGE_SIZE}"
+            if cursor:
+                url += f"&cursor={quote(cursor)}"
+            response = _shared_get(url)
+            if response.status_code != 200:
+                st.error(f"Error fetching patients: {response.status_code}")
+                return patients
+            page = response.json()
+            patients.extend(page["items"])
+            cursor = page.get("next")
+            if not cursor:
+                return patients
+    except Exception as e:
+        st.error(f"Error: {str(e)}")
+        return patients
+
+def fetch_dashboard_summary():
+    """Fetch aggregated dashboard metrics from the API"""
+    try:
+        response = _shared_get(f"{API_BASE_URL}/dashboard/summary")
         if response.status_code == 200:
             return response.json()
         else:
-            st.error(f"Error fetching patients: {response.status_code}")
-            return []
+            st.error(f"Error fetching dashboard summary: {response.status_code}")
+            return None
     except Exception as e:
         st.error(f"Error: {str(e)}")
-        return []
+        return None
+
+@st.cache_data
+def build_treatment_pie(treatments, counts):
+    """Build the treatment distribution pie from precomputed counts"""
+    return go.Figure(go.Pie(labels=list(treatments), values=list(counts)))
+
+@st.cache_data
+def build_efficacy_histogram(efficacies, bins=20):
+    """Build the efficacy histogram from precomputed bin counts"""
+    counts, edges = np.histogram(efficacies, bins=bins)
+    return go.Figure(go.Bar(x=edges[:-1], y=counts, width=np.diff(edges), offset=0))
 
 def add_patient(patient_data):
     """Add a new patient"""
@@ -51,7 +114,7 @@ def add_patient(patient_data):
 def get_treatment_recommendation(patient_id):
     """Get treatment recommendation for a patient"""
     try:
-        response = requests.get(
+        response = _shared_get(
             f"{API_BASE_URL}/patients/{patient_id}/treatment_recommendation"
         )
         if response.status_code == 200:
@@ -67,33 +130,24 @@ def get_treatment_recommendation(patient_id):
 if page == "Dashboard":
     st.title("Genomics Treatment Dashboard")
     
-    # Fetch patients
-    patients = fetch_patients()
+    # Fetch aggregated metrics in a single request
+    summary = fetch_dashboard_summary()
     
     # Display metrics
     col1, col2, col3 = st.columns(3)
     
-    with col1:
-        st.metric("Total Patients", len(patients))
-    
-    with col2:
-        if patients:
-            recommendations = [
-                get_treatment_recommendation(p['id']) for p in patients
-            ]
-            efficacies = [
-                float(r['efficacy']) for r in recommendations if r and 'efficacy' in r
-            ]
-            avg_efficacy = sum(efficacies) / len(efficacies) if efficacies else 0
-            st.metric("Average Treatment Efficacy", f"{avg_efficacy:.1%}")
+    if summary:
+        with col1:
+            st.metric("Total Patients", summary['total'])
+        
+        with col2:
+            st.metric("Average Treatment Efficacy", f"{summary['avg_efficacy']:.1%}")
+        
+        with col3:
+            st.metric("High Confidence Predictions", summary['high_conf'])
     
-    with col3:
-        if patients:
-            high_conf = sum(
-                1 for r in recommendations 
-                if r and r.get('confidence_level') == 'high'
-            )
-            st.metric("High Confidence Predictions", high_conf)
+    # Fetch patients
+    patients = fetch_patients()
     
     # Display patient list
     if patients:
@@ -177,12 +231,15 @@ elif page == "Treatment Analysis":
             
             # Treatment distribution
             st.subheader("Treatment Distribution")
-            fig = px.pie(df, names='treatment')
+            treatment_counts = df['treatment'].value_counts()
+            fig = build_treatment_pie(
+                tuple(treatment_counts.index), tuple(treatment_counts.values)
+            )
             st.plotly_chart(fig, use_container_width=True)
             
             # Efficacy distribution
             st.subheader("Treatment Efficacy Distribution")
-            fig = px.histogram(df, x='efficacy')
+            fig = build_efficacy_histogram(tuple(df['efficacy']))
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.warning("No treatment data available")
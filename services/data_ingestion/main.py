@@ -4,19 +4,52 @@ import pandas as pd
 import numpy as np
 import logging
 import json
+import os
+import time
+import asyncio
+import functools
 import boto3
-from typing import Dict, Any, List
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterable, List, Tuple
 from decimal import Decimal
-from pydantic import BaseModel
+from datetime import datetime, timezone
+from pydantic import BaseModel, ValidationError, field_validator
+from services.utils.responses import DecimalORJSONResponse
 
 # Configure logging
-logging.basicConfig(level=logging.DEBUG)
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper())
 logger = logging.getLogger(__name__)
 
-# Initialize DynamoDB client
-dynamodb = boto3.client('dynamodb', endpoint_url='http://localhost:8000')
+# Initialize DynamoDB table; the resource layer marshals native Python types
+dynamodb = boto3.resource(
+    'dynamodb',
+    endpoint_url='http://localhost:8000',
+    config=Config(
+        max_pool_connections=100,
+        tcp_keepalive=True,
+        connect_timeout=1,
+        read_timeout=3,
+        retries={'mode': 'adaptive', 'max_attempts': 5}
+    )
+)
+patients_table = dynamodb.Table('patients')
+
+# BatchWriteItem accepts at most 25 puts; unprocessed items are retried with backoff
+BATCH_WRITE_SIZE = 25
+BATCH_WRITE_ATTEMPTS = 5
+BATCH_WRITE_BACKOFF = 0.05  # seconds
+
+# boto3 blocks on the socket, so DynamoDB calls run here instead of on the event loop
+_ddb_exec = ThreadPoolExecutor(max_workers=int(os.getenv('DDB_THREADS', 32)))
 
-app = FastAPI()
+async def _run(fn, *args, **kwargs):
+    """Run a blocking boto3 call in the DynamoDB thread pool"""
+    return await asyncio.get_running_loop().run_in_executor(
+        _ddb_exec, functools.partial(fn, *args, **kwargs)
+    )
+
+app = FastAPI(default_response_class=DecimalORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -33,31 +66,72 @@ class Patient(BaseModel):
     genomic_data: Dict[str, Any]
     medical_history: Dict[str, Any]
 
+    @field_validator('age', mode='before')
+    @classmethod
+    def age_as_string(cls, value: Any) -> Any:
+        # Uploaded files carry age as a number; it is stored as a string
+        if isinstance(value, int) and not isinstance(value, bool):
+            return str(value)
+        return value
+
 class BatchPatientsRequest(BaseModel):
     patients: List[Patient]
 
-def convert_to_dynamodb_item(patient: Dict[str, Any]) -> Dict[str, Any]:
-    """Convert patient data to DynamoDB format"""
-    return {
-        'id': {'S': patient['id']},
-        'name': {'S': patient['name']},
-        'age': {'S': str(patient['age'])},
-        'genomic_data': {
-            'M': {
-                'gene_variants': {'M': {k: {'S': str(v)} for k, v in patient['genomic_data']['gene_variants'].items()}},
-                'mutation_scores': {'M': {k: {'S': str(v)} for k, v in patient['genomic_data']['mutation_scores'].items()}},
-                'sequencing_quality': {'S': str(patient['genomic_data']['sequencing_quality'])}
-            }
-        },
-        'medical_history': {
-            'M': {
-                'conditions': {'L': [{'S': str(c)} for c in patient['medical_history']['conditions']]},
-                'treatments': {'L': [{'S': str(t)} for t in patient['medical_history']['treatments']]},
-                'medications': {'L': [{'S': str(m)} for m in patient['medical_history']['medications']]},
-                'allergies': {'L': [{'S': str(a)} for a in patient['medical_history']['allergies']]}
-            }
-        }
-    }
+def index_fields() -> Dict[str, str]:
+    """Attributes that place a patient in the patients table's active-index GSI"""
+    return {'entity_type': 'patient', 'created_at': datetime.now(timezone.utc).isoformat()}
+
+def to_dynamodb_item(patient: Patient) -> Dict[str, Any]:
+    """Convert a patient model to a DynamoDB item (floats become Decimal)"""
+    return {**json.loads(patient.model_dump_json(), parse_float=Decimal), **index_fields()}
+
+def write_patients(items: Iterable[Tuple[str, Dict[str, Any]]]) -> Tuple[int, List[Dict[str, str]]]:
+    """Write (patient_id, item) pairs with BatchWriteItem, counting only items DynamoDB accepted"""
+    success_count = 0
+    failed_patients = []
+    
+    # A later item with the same id replaces an earlier one, as sequential puts would;
+    # BatchWriteItem rejects duplicate keys in one request
+    pending: Dict[str, Tuple[List[str], Dict[str, Any]]] = {}
+    for patient_id, item in items:
+        patient_ids = pending[item['id']][0] if item['id'] in pending else []
+        patient_ids.append(patient_id)
+        pending[item['id']] = (patient_ids, {**item, **index_fields()})
+    
+    entries = list(pending.values())
+    for start in range(0, len(entries), BATCH_WRITE_SIZE):
+        chunk = entries[start:start + BATCH_WRITE_SIZE]
+        try:
+            unprocessed = write_chunk([item for _, item in chunk])
+        except Exception as e:
+            logger.error("Error writing %d patients: %s", len(chunk), e)
+            failed_patients.extend(
+                {"patient_id": patient_id, "error": str(e)}
+                for patient_ids, _ in chunk for patient_id in patient_ids
+            )
+            continue
+        
+        for patient_ids, item in chunk:
+            if item['id'] in unprocessed:
+                failed_patients.extend(
+                    {"patient_id": patient_id, "error": "Unprocessed after retries"}
+                    for patient_id in patient_ids
+                )
+            else:
+                success_count += len(patient_ids)
+    
+    return success_count, failed_patients
+
+def write_chunk(items: List[Dict[str, Any]]) -> set:
+    """Send one BatchWriteItem, retrying unprocessed items; return ids still unwritten"""
+    request_items = {patients_table.name: [{'PutRequest': {'Item': item}} for item in items]}
+    for attempt in range(BATCH_WRITE_ATTEMPTS):
+        response = patients_table.meta.client.batch_write_item(RequestItems=request_items)
+        request_items = response.get('UnprocessedItems')
+        if not request_items:
+            return set()
+        time.sleep(min(BATCH_WRITE_BACKOFF * 2 ** attempt, 1.0))
+    return {request['PutRequest']['Item']['id'] for request in request_items[patients_table.name]}
 
 @app.get("/")
 async def root():
@@ -75,56 +149,36 @@ async def health_check():
 async def ingest_patient(patient: Patient):
     """Ingest a single patient"""
     try:
-        logger.debug(f"Processing patient: {patient.id}")
-        
-        # Convert patient data to DynamoDB format
-        item = convert_to_dynamodb_item(patient.dict())
+        logger.debug("Processing patient: %s", patient.id)
         
         # Store in DynamoDB
-        dynamodb.put_item(
-            TableName='patients',
-            Item=item
-        )
+        await _run(patients_table.put_item, Item=to_dynamodb_item(patient))
         
-        logger.info(f"Successfully ingested patient {patient.id}")
+        logger.info("Successfully ingested patient %s", patient.id)
         return {
             "message": "Patient ingested successfully",
             "patient_id": patient.id
         }
         
     except Exception as e:
-        logger.error(f"Error ingesting patient: {str(e)}")
+        logger.error("Error ingesting patient: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/ingest/patients/batch")
 async def ingest_patients_batch(request: BatchPatientsRequest):
     """Ingest multiple patients"""
     try:
-        logger.debug(f"Processing {len(request.patients)} patients")
+        logger.debug("Processing %d patients", len(request.patients))
         
-        success_count = 0
-        failed_patients = []
+        # Convert the whole batch in a single serialize/parse pass
+        items = json.loads(request.model_dump_json(), parse_float=Decimal)['patients']
         
-        for patient in request.patients:
-            try:
-                # Convert patient data to DynamoDB format
-                item = convert_to_dynamodb_item(patient.dict())
-                
-                # Store in DynamoDB
-                dynamodb.put_item(
-                    TableName='patients',
-                    Item=item
-                )
-                success_count += 1
-                
-            except Exception as e:
-                logger.error(f"Error ingesting patient {patient.id}: {str(e)}")
-                failed_patients.append({
-                    "patient_id": patient.id,
-                    "error": str(e)
-                })
+        success_count, failed_patients = await _run(
+            write_patients,
+            [(patient.id, item) for patient, item in zip(request.patients, items)]
+        )
         
-        logger.info(f"Successfully ingested {success_count} patients")
+        logger.info("Successfully ingested %d patients", success_count)
         return {
             "message": "Batch ingestion completed",
             "success_count": success_count,
@@ -133,45 +187,38 @@ async def ingest_patients_batch(request: BatchPatientsRequest):
         }
         
     except Exception as e:
-        logger.error(f"Error in batch ingestion: {str(e)}")
+        logger.error("Error in batch ingestion: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/ingest/file")
 async def ingest_file(file: UploadFile = File(...)):
     """Ingest patient data from file"""
     try:
-        logger.debug(f"Processing file: {file.filename}")
+        logger.debug("Processing file: %s", file.filename)
         content = await file.read()
-        content_str = content.decode()
         
         # Parse JSON data
-        patients_data = json.loads(content_str)
+        patients_data = json.loads(content)
         if not isinstance(patients_data, list):
             patients_data = [patients_data]
         
-        success_count = 0
+        # Validate each entry on its own so one bad row fails only itself
+        items = []
         failed_patients = []
-        
         for patient_data in patients_data:
             try:
-                # Convert patient data to DynamoDB format
-                item = convert_to_dynamodb_item(patient_data)
-                
-                # Store in DynamoDB
-                dynamodb.put_item(
-                    TableName='patients',
-                    Item=item
-                )
-                success_count += 1
-                
-            except Exception as e:
-                logger.error(f"Error ingesting patient {patient_data.get('id', 'unknown')}: {str(e)}")
-                failed_patients.append({
-                    "patient_id": patient_data.get('id', 'unknown'),
-                    "error": str(e)
-                })
+                patient = Patient.model_validate(patient_data)
+            except ValidationError as e:
+                patient_id = patient_data.get('id', 'unknown') if isinstance(patient_data, dict) else 'unknown'
+                logger.error("Invalid patient %s: %s", patient_id, e)
+                failed_patients.append({"patient_id": str(patient_id), "error": str(e)})
+                continue
+            items.append((patient.id, to_dynamodb_item(patient)))
+        
+        success_count, write_failures = await _run(write_patients, items)
+        failed_patients.extend(write_failures)
         
-        logger.info(f"Successfully processed {success_count} patients from file")
+        logger.info("Successfully processed %d patients from file", success_count)
         return {
             "message": "File ingestion completed",
             "success_count": success_count,
@@ -180,9 +227,17 @@ async def ingest_file(file: UploadFile = File(...)):
         }
         
     except Exception as e:
-        logger.error(f"Error processing file: {str(e)}")
+        logger.error("Error processing file: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8084)
+    uvicorn.run(
+        "services.data_ingestion.main:app",
+        host="0.0.0.0",
+        port=8084,
+        workers=int(os.getenv('WEB_CONCURRENCY', os.cpu_count() or 1)),
+        loop="uvloop",
+        http="httptools",
+        log_level="info"
+    )
@@ -1,8 +1,28 @@
+import atexit
 import logging
+import queue
+from logging.handlers import QueueListener
 import watchtower
 import boto3
 from botocore.exceptions import ClientError
+import orjson
 import os
+from services.utils.logging import LOG_QUEUE_SIZE, LocalQueueHandler
+
+class JsonFormatter(logging.Formatter):
+    """Render records as one orjson-encoded line, merging any extra_data"""
+
+    def format(self, record):
+        log_data = {
+            'timestamp': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            log_data['exception'] = self.formatException(record.exc_info)
+        log_data.update(getattr(record, 'extra_data', {}))
+        return orjson.dumps(log_data, default=str).decode()
 
 def setup_logging():
     logger = logging.getLogger(__name__)
@@ -11,18 +31,32 @@ def setup_logging():
     # Always add a console handler
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)
+    console_handler.setFormatter(JsonFormatter())
     logger.addHandler(console_handler)
 
     try:
         # Attempt to set up CloudWatch handler
+        # Events are batched into PutLogEvents calls every 5 s or at 1 MB / 10k events
         cloudwatch_handler = watchtower.CloudWatchLogHandler(
             log_group='GenomicsTreatmentAPI',
             stream_name='ApplicationLogs',
-            use_queues=False,
+            use_queues=True,
+            send_interval=5,
+            max_batch_count=10000,
+            max_batch_size=1048576,
             create_log_group=True,
             boto3_client=boto3.client('logs', region_name=os.getenv('AWS_DEFAULT_REGION'))
         )
-        logger.addHandler(cloudwatch_handler)
+        
+        cloudwatch_handler.setFormatter(JsonFormatter())
+        
+        # Format and hand off records on a background thread, not the caller's
+        log_queue = queue.Queue(LOG_QUEUE_SIZE)
+        listener = QueueListener(log_queue, cloudwatch_handler, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+        # Unlike QueueHandler, this leaves exc_info for the listener to render
+        logger.addHandler(LocalQueueHandler(log_queue))
         logger.info("CloudWatch logging setup successful")
     except Exception as e:
         logger.error(f"Failed to set up CloudWatch logging: {str(e)}")
@@ -31,13 +65,7 @@ def setup_logging():
     return logger
 
 def log_event(logger, event_type, event_data):
-    logger.info({
-        'event_type': event_type,
-        'data': event_data
-    })
+    logger.info(event_type, extra={'extra_data': {'event_type': event_type, 'data': event_data}})
 
 def log_error(logger, error_message):
-    logger.error({
-        'event_type': 'error',
-        'message': error_message
-    })
\ No newline at end of file
+    logger.error(error_message, extra={'extra_data': {'event_type': 'error'}})
@@ -1,13 +1,23 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import tensorflow as tf
+import asyncio
+import io
+import time
+import uuid
+import os
 import boto3
+from botocore.config import Config
+import h5py
+import numpy as np
+from boto3.s3.transfer import TransferConfig
 import pandas as pd
 from datetime import datetime
 from services.utils.logging import setup_logging, log_event, log_error
 
-app = FastAPI()
-logger = setup_logging()
+app = FastAPI(default_response_class=ORJSONResponse)
+logger = setup_logging('model_training')
 
 # Add CORS middleware
 app.add_middleware(
@@ -18,9 +28,78 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-s3 = boto3.client('s3')
+s3 = boto3.client(
+    's3',
+    config=Config(
+        region_name=os.getenv('AWS_REGION'),
+        max_pool_connections=64,
+        tcp_keepalive=True,
+        retries={'mode': 'adaptive', 'max_attempts': 5},
+        s3={'addressing_style': 'virtual'}
+    )
+)
+
+# Let XLA fuse the small dense layers
+tf.config.optimizer.set_jit(True)
+
+BATCH_SIZE = 256
+SHUFFLE_BUFFER = 10000
+VALIDATION_SPLIT = 0.2
+
+MODEL_BUCKET = 'genomics-models'
+DATA_BUCKET = 'genomics-data'
+DATA_KEY = 'preprocessed/latest_data.csv'
+
+# Move models and data as parallel 8 MB multipart chunks / ranged GETs
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=16,
+    use_threads=True
+)
+
+# Status of background model uploads, keyed by task id; finished ones are kept for an hour
+upload_tasks = {}
+upload_finished_at = {}
+UPLOAD_STATUS_TTL = int(os.getenv('UPLOAD_STATUS_TTL', 3600))  # seconds
+
+# The event loop only holds weak references to tasks, so running uploads are kept here
+background_tasks = set()
+
+def prune_upload_tasks():
+    """Forget finished uploads whose status is older than the TTL"""
+    cutoff = time.monotonic() - UPLOAD_STATUS_TTL
+    for task_id in [t for t, finished_at in upload_finished_at.items() if finished_at < cutoff]:
+        del upload_finished_at[task_id]
+        upload_tasks.pop(task_id, None)
+
+def upload_model(key: str, data: bytes):
+    s3.upload_fileobj(io.BytesIO(data), MODEL_BUCKET, key, Config=TRANSFER_CONFIG)
+
+def serialize_model(model) -> bytes:
+    # Write the HDF5 model into memory instead of a local file
+    buffer = io.BytesIO()
+    with h5py.File(buffer, 'w') as f:
+        model.save(f, save_format='h5')
+    return buffer.getvalue()
 
-@app.post("/train")
+async def upload_model_in_background(task_id: str, objects: dict):
+    # objects maps a response field to its (S3 key, bytes)
+    paths = {name: key for name, (key, _) in objects.items()}
+    try:
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(None, upload_model, key, data) for key, data in objects.values()
+        ))
+        upload_tasks[task_id] = {"status": "completed", **paths}
+        log_event(logger, "model_upload", {"task_id": task_id, **paths})
+    except Exception as e:
+        upload_tasks[task_id] = {"status": "failed", **paths, "error": str(e)}
+        log_error(logger, str(e))
+    finally:
+        upload_finished_at[task_id] = time.monotonic()
+
+@app.post("/train", status_code=202)
 async def train_model():
     try:
         # Load preprocessed data from S3
@@ -29,14 +108,29 @@ async def train_model():
         # Split data into features and labels
         X, y = prepare_data(data)
         
+        # Build input pipelines so batches are prefetched while the model trains
+        train_ds, val_ds = make_datasets(X, y)
+        
         # Create and train the model
         model = create_model(input_shape=X.shape[1])
-        history = model.fit(X, y, epochs=10, validation_split=0.2, callbacks=[tf.keras.callbacks.EarlyStopping(patience=3)])
+        history = model.fit(train_ds, epochs=10, validation_data=val_ds, callbacks=[tf.keras.callbacks.EarlyStopping(patience=3)])
         
         # Save the trained model
         model_path = f'model_{datetime.now().strftime("%Y%m%d_%H%M%S")}.h5'
-        model.save(model_path)
-        s3.upload_file(model_path, 'genomics-models', model_path)
+        tflite_path = model_path.replace('.h5', '.tflite')
+        objects = {
+            "model_path": (model_path, serialize_model(model)),
+            # INT8-quantized copy for serving
+            "tflite_path": (tflite_path, quantize_model(model, X))
+        }
+
+        # Upload to S3 off the request path, straight from memory
+        task_id = str(uuid.uuid4())
+        prune_upload_tasks()
+        upload_tasks[task_id] = {"status": "uploading", "model_path": model_path, "tflite_path": tflite_path}
+        task = asyncio.create_task(upload_model_in_background(task_id, objects))
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
         
         # Log training event
         log_event(logger, "model_training", {
@@ -46,24 +140,54 @@ async def train_model():
             "final_accuracy": history.history['accuracy'][-1]
         })
         
-        return {"message": "Model trained and saved successfully", "model_path": model_path}
+        return {
+            "message": "Model trained, upload in progress",
+            "model_path": model_path,
+            "tflite_path": tflite_path,
+            "task_id": task_id
+        }
     except Exception as e:
         log_error(logger, str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/train/{task_id}")
+async def get_upload_status(task_id: str):
+    if task_id not in upload_tasks:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return upload_tasks[task_id]
+
 def load_data_from_s3():
-    # Implement data loading from S3
-    # For example:
-    # s3.download_file('genomics-data', 'preprocessed/latest_data.csv', 'latest_data.csv')
-    # return pd.read_csv('latest_data.csv')
-    pass
+    # Download with concurrent byte-range GETs straight into memory,
+    # then parse the CSV without a round-trip through local disk
+    buffer = io.BytesIO()
+    s3.download_fileobj(DATA_BUCKET, DATA_KEY, buffer, Config=TRANSFER_CONFIG)
+    buffer.seek(0)
+    return pd.read_csv(buffer)
 
 def prepare_data(data):
     # Split data into features and labels
-    X = data.drop('target', axis=1)
-    y = data['target']
+    X = data.drop('target', axis=1).values.astype(np.float32)
+    y = data['target'].values.astype(np.float32)
     return X, y
 
+def make_datasets(X, y):
+    # Hold out the tail for validation, matching Keras' validation_split
+    split = int(len(X) * (1 - VALIDATION_SPLIT))
+    train_ds = (
+        tf.data.Dataset.from_tensor_slices((X[:split], y[:split]))
+        .cache()
+        .shuffle(SHUFFLE_BUFFER)
+        .batch(BATCH_SIZE)
+        .prefetch(tf.data.AUTOTUNE)
+    )
+    val_ds = (
+        tf.data.Dataset.from_tensor_slices((X[split:], y[split:]))
+        .batch(BATCH_SIZE)
+        .cache()
+        .prefetch(tf.data.AUTOTUNE)
+    )
+    return train_ds, val_ds
+
 def create_model(input_shape):
     model = tf.keras.Sequential([
         tf.keras.layers.Dense(64, activation='relu', input_shape=(input_shape,)),
@@ -72,3 +196,17 @@ def create_model(input_shape):
     ])
     model.compile(optimizer='adam', loss='binary_crossentropy', metrics=['accuracy'])
     return model
+
+def quantize_model(model, X, num_samples=100):
+    # Full-integer quantization calibrated on a sample of the training features
+    def representative_dataset():
+        for i in range(min(num_samples, len(X))):
+            yield [X[i:i + 1]]
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.int8
+    converter.inference_output_type = tf.int8
+    return converter.convert()
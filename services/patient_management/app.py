@@ -1,19 +1,130 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import logging
-import boto3
-from typing import Dict, Optional
-from datetime import datetime
-import json
-from decimal import Decimal
-import requests
+import os
+import base64
+import binascii
+import hashlib
+import aioboto3
+from aiobotocore.config import AioConfig
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, Dict, Optional, Tuple
+from datetime import datetime, timezone
+from pydantic import BaseModel, ConfigDict, ValidationError, field_validator
+import time
+from collections import Counter
+import httpx
+import orjson
+from cachetools import TTLCache
+from services.patient_management.patient_loader import PatientLoader
+from services.patient_management.attribute_values import compile_item_serializer, from_attribute_map
+from services.utils.responses import DecimalORJSONResponse, orjson_default
 
 # Configure logging
-logging.basicConfig(level=logging.DEBUG)
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper())
 logger = logging.getLogger(__name__)
 
+TREATMENT_PREDICTION_URL = os.getenv('TREATMENT_PREDICTION_URL', 'http://localhost:8085')
+
+# Bound in-flight prediction calls and retry 5xx with exponential backoff
+PREDICT_CONCURRENCY = 64
+PREDICT_MAX_ATTEMPTS = 3
+PREDICT_BACKOFF_BASE = 0.05  # seconds
+PREDICT_BACKOFF_MAX = 1.0  # seconds
+
+# Recommendations keyed by a hash of the prediction payload
+RECOMMENDATION_CACHE_TTL = 3600  # seconds
+_recommendations: TTLCache = TTLCache(maxsize=10_000, ttl=RECOMMENDATION_CACHE_TTL)
+
+# DynamoDB settings; the resource itself is opened once per worker at startup
+DYNAMODB_INIT_TIMEOUT = 60  # seconds
+DYNAMODB_ENDPOINT = os.getenv('DYNAMODB_ENDPOINT', 'http://localhost:8000')
+DYNAMODB_REGION = os.getenv('AWS_DEFAULT_REGION', 'us-west-2')
+SCAN_SEGMENTS = min((os.cpu_count() or 1) * 2, 8)
+PATIENT_PROJECTION = {
+    'ProjectionExpression': 'id, #n, age, genomic_data, medical_history',
+    'ExpressionAttributeNames': {'#n': 'name'}
+}
+# GSI over every patient, sorted by creation time
+PATIENT_TABLE = 'patients'
+PATIENT_INDEX = 'active-index'
+PATIENT_ENTITY_TYPE = 'patient'
+PATIENT_UPDATE_EXPRESSION = 'SET #n = :n, age = :a, genomic_data = :g, medical_history = :m'
+PATIENT_UPDATE_NAMES = {'#n': 'name'}
+# Shared connection pool; aiohttp keeps idle connections open for reuse
+DYNAMODB_CONFIG = AioConfig(
+    max_pool_connections=100,
+    tcp_keepalive=True,
+    connect_timeout=1,
+    read_timeout=3,
+    retries={'mode': 'adaptive', 'max_attempts': 5},
+    connector_args={'keepalive_timeout': 60}
+)
+session = aioboto3.Session(
+    aws_access_key_id='dummy',
+    aws_secret_access_key='dummy'
+)
+
+async def open_patient_table(exit_stack: AsyncExitStack):
+    """Open the DynamoDB resource and client and check that the patients table answers"""
+    dynamodb = await exit_stack.enter_async_context(
+        session.resource(
+            'dynamodb',
+            endpoint_url=DYNAMODB_ENDPOINT,
+            region_name=DYNAMODB_REGION,
+            config=DYNAMODB_CONFIG
+        )
+    )
+    # A plain client takes pre-serialized items; the resource's client re-serializes everything
+    client = await exit_stack.enter_async_context(
+        session.client(
+            'dynamodb',
+            endpoint_url=DYNAMODB_ENDPOINT,
+            region_name=DYNAMODB_REGION,
+            config=DYNAMODB_CONFIG
+        )
+    )
+    table = await dynamodb.Table(PATIENT_TABLE)
+    await table.scan(Limit=1)
+    return dynamodb, client, table
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open long-lived clients for this worker, warm up request paths, close on exit"""
+    async with AsyncExitStack() as exit_stack:
+        try:
+            dynamodb, app.state.patient_client, app.state.patient_table = await asyncio.wait_for(
+                open_patient_table(exit_stack), timeout=DYNAMODB_INIT_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            logger.error("DynamoDB initialization timed out after %d seconds", DYNAMODB_INIT_TIMEOUT)
+            raise
+        app.state.patient_loader = PatientLoader(dynamodb, table_name=PATIENT_TABLE)
+        app.state.patient_loader.start()
+        app.state.http = httpx.AsyncClient(
+            base_url=TREATMENT_PREDICTION_URL,
+            timeout=5.0,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+        )
+        # Created here so it belongs to the loop serving requests
+        app.state.predict_sem = asyncio.Semaphore(PREDICT_CONCURRENCY)
+
+        # Pay one-time schema and serializer setup before the first request
+        app.openapi()
+        serialize_patient(PatientData(id='0', name='warmup', age=1, genomic_data={}, medical_history={}))
+
+        try:
+            yield
+        finally:
+            await app.state.http.aclose()
+            await app.state.patient_loader.stop()
+
 # Create FastAPI app
-app = FastAPI()
+app = FastAPI(default_response_class=DecimalORJSONResponse, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -23,23 +134,119 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize DynamoDB
-dynamodb = boto3.resource('dynamodb',
-                         endpoint_url='http://localhost:8000',
-                         region_name='us-west-2',
-                         aws_access_key_id='dummy',
-                         aws_secret_access_key='dummy')
-patient_table = dynamodb.Table('patients')
+async def scan_segment(table, segment: int, total_segments: int) -> list:
+    """Read every page of one parallel scan segment"""
+    items = []
+    scan_kwargs = {
+        'Segment': segment,
+        'TotalSegments': total_segments,
+        **PATIENT_PROJECTION
+    }
+    while True:
+        response = await table.scan(**scan_kwargs)
+        items.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return items
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+async def scan_patients() -> list:
+    """Read all patients with a parallel segmented scan"""
+    segments = await asyncio.gather(*(
+        scan_segment(app.state.patient_table, segment, SCAN_SEGMENTS)
+        for segment in range(SCAN_SEGMENTS)
+    ))
+    return [item for segment in segments for item in segment]
+
+def encode_cursor(last_evaluated_key: Optional[Dict]) -> Optional[str]:
+    """Turn a scan's LastEvaluatedKey into an opaque page cursor"""
+    if last_evaluated_key is None:
+        return None
+    return base64.urlsafe_b64encode(orjson.dumps(last_evaluated_key, default=orjson_default)).decode()
+
+def decode_cursor(cursor: str) -> Dict:
+    """Turn a page cursor back into an ExclusiveStartKey"""
+    try:
+        return orjson.loads(base64.urlsafe_b64decode(cursor))
+    except (binascii.Error, orjson.JSONDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def fetch_patient(patient_id: str) -> Dict:
+    """Load a patient record, raising 404 if it does not exist"""
+    patient = await app.state.patient_loader.load(patient_id)
+    if not patient:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    return patient
+
+class PatientData(BaseModel):
+    model_config = ConfigDict(extra='forbid')
+
+    id: str
+    name: str
+    age: int
+    genomic_data: Dict[str, Any]
+    medical_history: Dict[str, Any]
+
+    @field_validator('age', mode='after')
+    @classmethod
+    def validate_age(cls, value: int) -> int:
+        if not 0 <= value <= 150:
+            raise ValueError('age must be between 0 and 150')
+        return value
+
+    @field_validator('name', mode='after')
+    @classmethod
+    def validate_name(cls, value: str) -> str:
+        value = value.strip()
+        if not value:
+            raise ValueError('name must not be empty')
+        return value
 
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            return str(obj)
-        return super(DecimalEncoder, self).default(obj)
+async def parse_patient(request: Request) -> PatientData:
+    """Validate the request body straight from JSON bytes in pydantic-core"""
+    try:
+        return PatientData.model_validate_json(await request.body())
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+
+# PatientData has a fixed schema, so its AttributeValue serializer is generated once at import
+serialize_patient = compile_item_serializer(PatientData)
+
+async def request_prediction(payload: bytes) -> httpx.Response:
+    """Call the prediction service, retrying server errors"""
+    for attempt in range(PREDICT_MAX_ATTEMPTS):
+        async with app.state.predict_sem:
+            response = await app.state.http.post(
+                "/predict",
+                content=payload,
+                headers={"Content-Type": "application/json"}
+            )
+        if response.status_code < 500 or attempt == PREDICT_MAX_ATTEMPTS - 1:
+            return response
+        logger.warning("Prediction service returned %d, retrying", response.status_code)
+        await asyncio.sleep(min(PREDICT_BACKOFF_BASE * 2 ** attempt, PREDICT_BACKOFF_MAX))
 
-def convert_decimals(obj):
-    """Convert Decimal objects to strings"""
-    return json.loads(json.dumps(obj, cls=DecimalEncoder))
+async def recommend_treatment(patient: Dict) -> Tuple[str, Dict]:
+    """Return (content hash, recommendation), calling the prediction service on a cache miss"""
+    payload = orjson.dumps({
+        "genomic_data": patient.get("genomic_data", {}),
+        "medical_history": patient.get("medical_history", {})
+    }, default=orjson_default, option=orjson.OPT_SORT_KEYS)
+    key = hashlib.blake2b(payload, digest_size=16).hexdigest()
+    if key in _recommendations:
+        return key, _recommendations[key]
+    
+    response = await request_prediction(payload)
+    if response.status_code != 200:
+        logger.error("Error from prediction service: %s", response.text)
+        raise HTTPException(status_code=500, detail="Error getting treatment recommendation")
+    
+    recommendation = orjson.loads(response.content)
+    _recommendations[key] = recommendation
+    return key, recommendation
+
+# Dashboard summary cache
+DASHBOARD_SUMMARY_TTL = 30  # seconds
+_dashboard_summary: Dict = {"expires": 0.0, "data": None}
 
 @app.get("/")
 async def root():
@@ -53,84 +260,171 @@ async def health_check():
     logger.debug("Health check endpoint called")
     try:
         # Test DynamoDB connection
-        patient_table.get_item(Key={'id': 'test'})
-        logger.info("Health check successful")
+        await app.state.patient_table.get_item(Key={'id': 'test'})
+        logger.debug("Health check successful")
         return {"status": "healthy"}
     except Exception as e:
-        logger.error(f"Health check failed: {str(e)}")
+        logger.error("Health check failed: %s", e)
         return {"status": "unhealthy", "error": str(e)}
 
 @app.post("/patients")
-async def create_patient(patient: Dict):
+async def create_patient(patient: PatientData = Depends(parse_patient)):
     """Create a new patient record"""
     try:
-        logger.debug(f"Creating patient: {json.dumps(patient, indent=2)}")
+        logger.debug("Creating patient: %s", patient.id)
         
         # Store in DynamoDB
-        patient_table.put_item(Item=patient)
-        logger.info(f"Created patient record: {patient['id']}")
+        item = {
+            **serialize_patient(patient),
+            'entity_type': {'S': PATIENT_ENTITY_TYPE},
+            'created_at': {'S': datetime.now(timezone.utc).isoformat()}
+        }
+        await app.state.patient_client.put_item(TableName=PATIENT_TABLE, Item=item)
+        app.state.patient_loader.prime(patient.id, from_attribute_map(item))
+        logger.info("Created patient record: %s", patient.id)
         return {"message": "Patient created successfully"}
     except Exception as e:
-        logger.error(f"Error creating patient: {str(e)}")
+        logger.error("Error creating patient: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.put("/patients/{patient_id}")
+async def update_patient(patient_id: str, patient: PatientData = Depends(parse_patient)):
+    """Update an existing patient record"""
+    try:
+        logger.debug("Updating patient: %s", patient_id)
+        item = serialize_patient(patient)
+        
+        # Update in place; the condition rejects unknown ids in the same round trip
+        await app.state.patient_client.update_item(
+            TableName=PATIENT_TABLE,
+            Key={'id': {'S': patient_id}},
+            UpdateExpression=PATIENT_UPDATE_EXPRESSION,
+            ConditionExpression='attribute_exists(id)',
+            ExpressionAttributeNames=PATIENT_UPDATE_NAMES,
+            ExpressionAttributeValues={
+                ':n': item['name'],
+                ':a': item['age'],
+                ':g': item['genomic_data'],
+                ':m': item['medical_history']
+            }
+        )
+        app.state.patient_loader.prime(patient_id, from_attribute_map({**item, 'id': {'S': patient_id}}))
+        logger.info("Updated patient record: %s", patient_id)
+        return {"message": "Patient updated successfully"}
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            raise HTTPException(status_code=404, detail="Patient not found")
+        logger.error("Error updating patient: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    except Exception as e:
+        logger.error("Error updating patient: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/patients/{patient_id}")
 async def get_patient(patient_id: str):
     """Get patient record by ID"""
     try:
-        logger.debug(f"Getting patient: {patient_id}")
-        response = patient_table.get_item(Key={'id': patient_id})
-        patient = response.get('Item')
-        if not patient:
-            raise HTTPException(status_code=404, detail="Patient not found")
-        logger.info(f"Retrieved patient: {patient_id}")
-        return convert_decimals(patient)
+        logger.debug("Getting patient: %s", patient_id)
+        patient = await fetch_patient(patient_id)
+        logger.debug("Retrieved patient: %s", patient_id)
+        return DecimalORJSONResponse(patient)
     except Exception as e:
-        logger.error(f"Error retrieving patient: {str(e)}")
+        logger.error("Error retrieving patient: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/patients")
-async def list_patients():
-    """List all patients"""
+async def list_patients(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    since: Optional[str] = None
+):
+    """List patients one page at a time, oldest first, optionally created since a timestamp"""
+    key_condition = Key('entity_type').eq(PATIENT_ENTITY_TYPE)
+    if since:
+        key_condition = key_condition & Key('created_at').gte(since)
+    query_kwargs = {
+        'IndexName': PATIENT_INDEX,
+        'KeyConditionExpression': key_condition,
+        'Limit': limit,
+        **PATIENT_PROJECTION
+    }
+    if cursor:
+        query_kwargs['ExclusiveStartKey'] = decode_cursor(cursor)
     try:
-        logger.debug("Listing all patients")
-        response = patient_table.scan()
+        logger.debug("Listing patients (limit %d)", limit)
+        response = await app.state.patient_table.query(**query_kwargs)
         patients = response.get('Items', [])
-        logger.info(f"Retrieved {len(patients)} patients")
-        return convert_decimals(patients)
+        logger.debug("Retrieved %d patients", len(patients))
+        return DecimalORJSONResponse({
+            "items": patients,
+            "next": encode_cursor(response.get('LastEvaluatedKey'))
+        })
     except Exception as e:
-        logger.error(f"Error listing patients: {str(e)}")
+        logger.error("Error listing patients: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/patients/{patient_id}/treatment_recommendation")
-async def get_treatment_recommendation(patient_id: str):
+async def get_treatment_recommendation(patient_id: str, if_none_match: Optional[str] = Header(None)):
     """Get treatment recommendation for a patient"""
     try:
         # Get patient data
-        logger.debug(f"Getting treatment recommendation for patient: {patient_id}")
-        patient = await get_patient(patient_id)
+        logger.debug("Getting treatment recommendation for patient: %s", patient_id)
+        patient = await fetch_patient(patient_id)
         
-        # Get treatment prediction from prediction service
-        response = requests.post(
-            "http://localhost:8085/predict",  # Updated port to 8085
-            json={
-                "genomic_data": patient.get("genomic_data", {}),
-                "medical_history": patient.get("medical_history", {})
-            }
+        # Get treatment prediction, cached by patient data content
+        key, recommendation = await recommend_treatment(patient)
+        etag = f'"{key}"'
+        if if_none_match == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        
+        logger.debug("Treatment recommendation received for patient %s", patient_id)
+        return DecimalORJSONResponse(recommendation, headers={"ETag": etag})
+        
+    except Exception as e:
+        logger.error("Error getting treatment recommendation: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/dashboard/summary")
+async def get_dashboard_summary():
+    """Get aggregated dashboard metrics for all patients"""
+    try:
+        now = time.monotonic()
+        if _dashboard_summary["data"] is not None and now < _dashboard_summary["expires"]:
+            return _dashboard_summary["data"]
+        
+        logger.debug("Building dashboard summary")
+        patients = await scan_patients()
+        results = await asyncio.gather(
+            *(recommend_treatment(patient) for patient in patients),
+            return_exceptions=True
         )
+        recommendations = [r[1] for r in results if isinstance(r, tuple)]
         
-        if response.status_code != 200:
-            logger.error(f"Error from prediction service: {response.text}")
-            raise HTTPException(status_code=500, detail="Error getting treatment recommendation")
-            
-        recommendation = response.json()
-        logger.info(f"Treatment recommendation received for patient {patient_id}")
-        return recommendation
+        efficacies = [float(r["efficacy"]) for r in recommendations if "efficacy" in r]
+        summary = {
+            "total": len(patients),
+            "avg_efficacy": sum(efficacies) / len(efficacies) if efficacies else 0,
+            "high_conf": sum(1 for r in recommendations if r.get("confidence_level") == "high"),
+            "treatment_counts": dict(Counter(
+                r.get("recommended_treatment", "Unknown") for r in recommendations
+            ))
+        }
         
+        _dashboard_summary["data"] = summary
+        _dashboard_summary["expires"] = now + DASHBOARD_SUMMARY_TTL
+        return summary
     except Exception as e:
-        logger.error(f"Error getting treatment recommendation: {str(e)}")
+        logger.error("Error building dashboard summary: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8080)
+    uvicorn.run(
+        "services.patient_management.app:app",
+        host="0.0.0.0",
+        port=8080,
+        workers=int(os.getenv('WEB_CONCURRENCY', os.cpu_count() or 1)),
+        loop="uvloop",
+        http="httptools",
+        log_level="info"
+    )
@@ -0,0 +1,72 @@
+from decimal import Decimal
+from typing import Any, Callable, Dict, Type
+from pydantic import BaseModel
+
+def to_attribute_value(value: Any) -> Dict[str, Any]:
+    """Serialize a plain Python value into a low-level DynamoDB AttributeValue"""
+    if isinstance(value, str):
+        return {'S': value}
+    if isinstance(value, bool):
+        return {'BOOL': value}
+    if isinstance(value, (int, float, Decimal)):
+        return {'N': str(value)}
+    if value is None:
+        return {'NULL': True}
+    if isinstance(value, dict):
+        return {'M': {str(key): to_attribute_value(item) for key, item in value.items()}}
+    if isinstance(value, (list, tuple)):
+        return {'L': [to_attribute_value(item) for item in value]}
+    if isinstance(value, (bytes, bytearray)):
+        return {'B': bytes(value)}
+    raise TypeError(f"Unsupported type for DynamoDB: {type(value).__name__}")
+
+def from_attribute_value(value: Dict[str, Any]) -> Any:
+    """Deserialize a low-level DynamoDB AttributeValue, with numbers as Decimal like boto3 reads"""
+    (tag, raw), = value.items()
+    if tag == 'S':
+        return raw
+    if tag == 'N':
+        return Decimal(raw)
+    if tag == 'M':
+        return {key: from_attribute_value(item) for key, item in raw.items()}
+    if tag == 'L':
+        return [from_attribute_value(item) for item in raw]
+    if tag == 'BOOL':
+        return raw
+    if tag == 'NULL':
+        return None
+    if tag == 'B':
+        return raw
+    if tag in ('SS', 'BS'):
+        return set(raw)
+    if tag == 'NS':
+        return {Decimal(item) for item in raw}
+    raise TypeError(f"Unsupported DynamoDB type: {tag}")
+
+def to_attribute_map(item: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Serialize a whole item for the low-level client"""
+    return {key: to_attribute_value(value) for key, value in item.items()}
+
+def from_attribute_map(item: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Deserialize a whole low-level item"""
+    return {key: from_attribute_value(value) for key, value in item.items()}
+
+# Field types with a fixed AttributeValue shape; anything else goes through to_attribute_value
+_FIELD_TEMPLATES = {
+    str: "{{'S': obj.{name}}}",
+    int: "{{'N': str(obj.{name})}}",
+    float: "{{'N': repr(obj.{name})}}",
+    bool: "{{'BOOL': obj.{name}}}",
+}
+
+def compile_item_serializer(model: Type[BaseModel]) -> Callable[[BaseModel], Dict[str, Dict[str, Any]]]:
+    """Generate a serializer specialized to a model's fields, skipping per-value type dispatch"""
+    entries = []
+    for name, field in model.model_fields.items():
+        template = _FIELD_TEMPLATES.get(field.annotation, "to_attribute_value(obj.{name})")
+        entries.append(f"{name!r}: " + template.format(name=name))
+
+    source = f"def serialize(obj):\n    return {{{', '.join(entries)}}}\n"
+    namespace = {'to_attribute_value': to_attribute_value}
+    exec(compile(source, f"<{model.__name__} serializer>", 'exec'), namespace)
+    return namespace['serialize']
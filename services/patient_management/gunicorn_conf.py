@@ -0,0 +1,11 @@
+import os
+
+# Gunicorn settings for patient_management: one uvicorn event loop per worker process
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY", 2 * (os.cpu_count() or 1) + 1))
+keepalive = 5
+
+# Import the app once in the master; DynamoDB and HTTP clients are still
+# opened per worker by the app's lifespan handler, after the fork
+preload_app = True
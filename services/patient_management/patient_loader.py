@@ -0,0 +1,104 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+class PatientLoader:
+    """Coalesce patient lookups into BatchGetItem calls and cache the results"""
+
+    def __init__(
+        self,
+        dynamodb,
+        table_name: str = 'patients',
+        max_batch_size: int = 100,
+        batch_window: float = 0.005,
+        cache_size: int = 10_000,
+        cache_ttl: int = 30
+    ):
+        self.dynamodb = dynamodb
+        self.table_name = table_name
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the background batching task"""
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background batching task"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def load(self, patient_id: str) -> Optional[Dict]:
+        """Load a patient record, or None if it does not exist"""
+        if patient_id in self.cache:
+            return self.cache[patient_id]
+
+        # Concurrent misses for the same id share one pending lookup
+        future = self._inflight.get(patient_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[patient_id] = future
+            self._queue.put_nowait((patient_id, future))
+        return await asyncio.shield(future)
+
+    def invalidate(self, patient_id: str):
+        """Drop a cached patient record after it has been written"""
+        self.cache.pop(patient_id, None)
+
+    def prime(self, patient_id: str, item: Dict):
+        """Cache a patient record that was just written"""
+        self.cache[patient_id] = item
+
+    async def _run(self):
+        """Drain pending lookups every batch window"""
+        while True:
+            batch = [await self._queue.get()]
+            await asyncio.sleep(self.batch_window)
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            try:
+                await self._dispatch(batch)
+            except Exception as e:
+                logger.error("Error loading patient batch: %s", e)
+                for patient_id, future in batch:
+                    self._inflight.pop(patient_id, None)
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future]]):
+        """Fetch a batch of patients with BatchGetItem and resolve their futures"""
+        pending: Dict[str, List[asyncio.Future]] = {}
+        for patient_id, future in batch:
+            pending.setdefault(patient_id, []).append(future)
+
+        items = {}
+        request_items = {
+            self.table_name: {'Keys': [{'id': patient_id} for patient_id in pending]}
+        }
+        while request_items:
+            response = await self.dynamodb.batch_get_item(RequestItems=request_items)
+            for item in response['Responses'].get(self.table_name, []):
+                items[item['id']] = item
+            request_items = response.get('UnprocessedKeys')
+
+        for patient_id, futures in pending.items():
+            item = items.get(patient_id)
+            if item is not None:
+                self.cache[patient_id] = item
+            self._inflight.pop(patient_id, None)
+            for future in futures:
+                if not future.done():
+                    future.set_result(item)
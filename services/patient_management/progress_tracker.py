@@ -1,24 +1,56 @@
 from typing import Dict, List, Optional
+from collections import Counter
+from decimal import Decimal
 import boto3
-from datetime import datetime
+import numpy as np
+from datetime import datetime, timezone
 import json
 import logging
+import os
+from botocore.config import Config
 from botocore.exceptions import ClientError
+from services.patient_management.attribute_values import to_attribute_map
 
 logger = logging.getLogger(__name__)
 
+# One pooled, keep-alive session shared by every ProgressTracker in the process
+DYNAMODB_CONFIG = Config(
+    max_pool_connections=int(os.getenv('DDB_POOL', 100)),
+    tcp_keepalive=True,
+    retries={'mode': 'adaptive', 'max_attempts': 3}
+)
+session = boto3.Session()
+dynamodb = session.resource('dynamodb', config=DYNAMODB_CONFIG)
+# Plain client for writes that are already serialized to AttributeValues
+client = session.client('dynamodb', config=DYNAMODB_CONFIG)
+
+# Per-patient running totals live in a companion item; '_' sorts after any ISO timestamp
+STATS_TIMESTAMP = '_stats'
+MAX_TIMESTAMP = '9999-12-31T23:59:59.999999'
+SIDE_EFFECT_PREFIX = 'side_effect:'
+SECONDS_PER_DAY = 86400
+# Set once the stats item has been built from the patient's full history
+BACKFILLED = 'backfilled'
+# Entry writes retried when a concurrent write cancels the transaction
+MAX_WRITE_ATTEMPTS = 3
+
 class ProgressTracker:
     def __init__(self):
-        self.dynamodb = boto3.resource('dynamodb')
-        self.table = self.dynamodb.Table('patient_progress')
+        self.dynamodb = dynamodb
+        self.client = client
+        self.table_name = 'patient_progress'
+        self.table = self.dynamodb.Table(self.table_name)
         
     def add_progress_entry(self, patient_id: str, data: Dict) -> Dict:
         """Add a new progress entry for a patient"""
         try:
-            timestamp = datetime.utcnow().isoformat()
+            now = datetime.now(timezone.utc)
+            timestamp = now.replace(tzinfo=None).isoformat()
+            ts_epoch = int(now.timestamp())
             item = {
                 'patient_id': patient_id,
                 'timestamp': timestamp,
+                'ts_epoch': ts_epoch,
                 'treatment': data['treatment'],
                 'efficacy_score': data['efficacy_score'],
                 'side_effects': data.get('side_effects', []),
@@ -27,114 +59,364 @@ class ProgressTracker:
                 'next_appointment': data.get('next_appointment', '')
             }
             
-            self.table.put_item(Item=item)
+            # The entry and its running totals are written in one transaction
+            self._write_with_stats(
+                patient_id,
+                {'Put': {'TableName': self.table_name, 'Item': to_attribute_map(item)}},
+                lambda: self._stats_update(
+                    patient_id,
+                    efficacy_delta=item['efficacy_score'],
+                    side_effect_deltas=Counter(item['side_effects']),
+                    entries_delta=1,
+                    ts_epoch=ts_epoch
+                )
+            )
             
-            logger.info(f"Added progress entry for patient {patient_id}")
+            logger.info("Added progress entry for patient %s", patient_id)
             return item
             
         except Exception as e:
-            logger.error(f"Error adding progress entry: {str(e)}")
+            logger.error("Error adding progress entry: %s", e)
             raise
     
-    def get_patient_progress(self, patient_id: str, start_date: Optional[str] = None) -> List[Dict]:
+    def get_patient_progress(
+        self,
+        patient_id: str,
+        start_date: Optional[str] = None,
+        consistent_read: bool = False
+    ) -> List[Dict]:
         """Get progress history for a patient"""
         try:
-            params = {
-                'KeyConditionExpression': 'patient_id = :pid',
-                'ExpressionAttributeValues': {':pid': patient_id}
-            }
-            
-            if start_date:
-                params['KeyConditionExpression'] += ' AND #ts >= :start'
-                params['ExpressionAttributeValues'][':start'] = start_date
-                params['ExpressionAttributeNames'] = {'#ts': 'timestamp'}
-            
-            response = self.table.query(**params)
-            progress_entries = response.get('Items', [])
-            
-            # Sort by timestamp
-            progress_entries.sort(key=lambda x: x['timestamp'])
+            progress_entries = []
+            page = self.get_patient_progress_page(patient_id, start_date, consistent_read=consistent_read)
+            progress_entries.extend(page['items'])
+            while page['next_key']:
+                page = self.get_patient_progress_page(
+                    patient_id,
+                    start_date,
+                    exclusive_start_key=page['next_key'],
+                    consistent_read=consistent_read
+                )
+                progress_entries.extend(page['items'])
             
             return progress_entries
             
         except Exception as e:
-            logger.error(f"Error retrieving progress: {str(e)}")
+            logger.error("Error retrieving progress: %s", e)
             raise
     
+    def get_patient_progress_page(
+        self,
+        patient_id: str,
+        start_date: Optional[str] = None,
+        limit: Optional[int] = None,
+        exclusive_start_key: Optional[Dict] = None,
+        consistent_read: bool = False
+    ) -> Dict:
+        """Get one page of a patient's progress history, oldest first"""
+        # Bound the sort key so the stats item is never returned
+        params = {
+            'KeyConditionExpression': 'patient_id = :pid AND #ts < :stats',
+            'ExpressionAttributeNames': {'#ts': 'timestamp'},
+            'ExpressionAttributeValues': {':pid': patient_id, ':stats': STATS_TIMESTAMP},
+            # DynamoDB returns entries in timestamp order
+            'ScanIndexForward': True
+        }
+        
+        if start_date:
+            params['KeyConditionExpression'] = 'patient_id = :pid AND #ts BETWEEN :start AND :end'
+            params['ExpressionAttributeValues'] = {
+                ':pid': patient_id,
+                ':start': start_date,
+                ':end': MAX_TIMESTAMP
+            }
+        if limit:
+            params['Limit'] = limit
+        if exclusive_start_key:
+            params['ExclusiveStartKey'] = exclusive_start_key
+        if consistent_read:
+            params['ConsistentRead'] = True
+        
+        response = self.table.query(**params)
+        return {
+            'items': response.get('Items', []),
+            'next_key': response.get('LastEvaluatedKey')
+        }
+    
     def update_progress_entry(self, patient_id: str, timestamp: str, updates: Dict) -> Dict:
         """Update an existing progress entry"""
         try:
-            update_expr = 'SET '
-            expr_attrs = {}
-            expr_values = {}
-            
-            for key, value in updates.items():
-                update_expr += f'#{key} = :{key}, '
-                expr_attrs[f'#{key}'] = key
-                expr_values[f':{key}'] = value
-            
-            update_expr = update_expr.rstrip(', ')
-            
-            response = self.table.update_item(
-                Key={
-                    'patient_id': patient_id,
-                    'timestamp': timestamp
-                },
-                UpdateExpression=update_expr,
-                ExpressionAttributeNames=expr_attrs,
-                ExpressionAttributeValues=expr_values,
-                ReturnValues='ALL_NEW'
-            )
+            key = {'patient_id': patient_id, 'timestamp': timestamp}
+            update_expr = 'SET ' + ', '.join(f'#{key} = :{key}' for key in updates)
+            expr_attrs = {f'#{key}': key for key in updates}
+            expr_values = {f':{key}': value for key, value in updates.items()}
             
-            return response.get('Attributes', {})
+            if 'efficacy_score' not in updates and 'side_effects' not in updates:
+                response = self.table.update_item(
+                    Key=key,
+                    UpdateExpression=update_expr,
+                    ExpressionAttributeNames=expr_attrs,
+                    ExpressionAttributeValues=expr_values,
+                    ReturnValues='ALL_OLD'
+                )
+                return {**response.get('Attributes', {}), **updates}
+            
+            # Running totals change too: apply the deltas against the entry as read,
+            # and cancel the transaction if a concurrent edit changed those fields
+            for attempt in range(MAX_WRITE_ATTEMPTS):
+                old_entry = self.table.get_item(Key=key, ConsistentRead=True).get('Item', {})
+                new_entry = {**old_entry, **updates}
+                
+                conditions = []
+                guard_attrs = dict(expr_attrs)
+                guard_values = dict(expr_values)
+                for field in ('efficacy_score', 'side_effects'):
+                    guard_attrs[f'#{field}'] = field
+                    if field in old_entry:
+                        conditions.append(f'#{field} = :old_{field}')
+                        guard_values[f':old_{field}'] = old_entry[field]
+                    else:
+                        conditions.append(f'attribute_not_exists(#{field})')
+                
+                side_effect_deltas = Counter(new_entry.get('side_effects', []))
+                side_effect_deltas.subtract(old_entry.get('side_effects', []))
+                entry_update = {
+                    'Update': {
+                        'TableName': self.table_name,
+                        'Key': to_attribute_map(key),
+                        'UpdateExpression': update_expr,
+                        'ConditionExpression': ' AND '.join(conditions),
+                        'ExpressionAttributeNames': guard_attrs,
+                        'ExpressionAttributeValues': to_attribute_map(guard_values)
+                    }
+                }
+                try:
+                    self._write_with_stats(
+                        patient_id,
+                        entry_update,
+                        lambda: self._stats_update(
+                            patient_id,
+                            efficacy_delta=(
+                                Decimal(str(new_entry.get('efficacy_score', 0))) -
+                                Decimal(str(old_entry.get('efficacy_score', 0)))
+                            ),
+                            side_effect_deltas=side_effect_deltas
+                        )
+                    )
+                    return new_entry
+                except ClientError as e:
+                    if not self._cancelled_by(e, 0) or attempt == MAX_WRITE_ATTEMPTS - 1:
+                        raise
+                    logger.debug("Progress entry %s/%s changed concurrently, retrying", patient_id, timestamp)
             
         except Exception as e:
-            logger.error(f"Error updating progress entry: {str(e)}")
+            logger.error("Error updating progress entry: %s", e)
             raise
     
+    def _write_with_stats(self, patient_id: str, entry_op: Dict, build_stats_op):
+        """Write an entry and its stats delta in one transaction, backfilling stats first if needed"""
+        self._ensure_stats(patient_id)
+        for attempt in range(MAX_WRITE_ATTEMPTS):
+            try:
+                self.client.transact_write_items(TransactItems=[entry_op, build_stats_op()])
+                return
+            except ClientError as e:
+                # The stats item went missing (or lost its marker); rebuild it and retry
+                if not self._cancelled_by(e, 1) or attempt == MAX_WRITE_ATTEMPTS - 1:
+                    raise
+                self._ensure_stats(patient_id)
+    
+    @staticmethod
+    def _cancelled_by(error: ClientError, index: int) -> bool:
+        """Whether a transaction was cancelled by the condition on its index-th item"""
+        if error.response['Error']['Code'] != 'TransactionCanceledException':
+            return False
+        reasons = error.response.get('CancellationReasons') or []
+        return index < len(reasons) and reasons[index].get('Code') == 'ConditionalCheckFailed'
+    
+    def _ensure_stats(self, patient_id: str):
+        """Build the stats item from the full history the first time a patient needs it"""
+        stats_key = {'patient_id': patient_id, 'timestamp': STATS_TIMESTAMP}
+        stats = self.table.get_item(Key=stats_key, ConsistentRead=True).get('Item')
+        if stats is not None and stats.get(BACKFILLED):
+            return
+        
+        # Transactional writes require the marker, so no entry can land between this
+        # read and the conditional put below without making the put fail
+        entries = self.get_patient_progress(patient_id, consistent_read=True)
+        stats = {
+            **stats_key,
+            BACKFILLED: True,
+            'n_entries': len(entries),
+            'sum_efficacy': sum((Decimal(str(entry['efficacy_score'])) for entry in entries), Decimal(0))
+        }
+        for effect, count in Counter(
+            effect for entry in entries for effect in entry.get('side_effects', ())
+        ).items():
+            stats[SIDE_EFFECT_PREFIX + effect] = count
+        if entries:
+            stats['first_ts_epoch'] = self._entry_epoch(entries[0])
+            stats['last_ts_epoch'] = self._entry_epoch(entries[-1])
+        
+        try:
+            self.table.put_item(Item=stats, ConditionExpression=f'attribute_not_exists({BACKFILLED})')
+            logger.info("Backfilled progress stats for patient %s from %d entries", patient_id, len(entries))
+        except ClientError as e:
+            # Another writer backfilled first
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+    
+    def _stats_update(
+        self,
+        patient_id: str,
+        efficacy_delta,
+        side_effect_deltas: Counter,
+        entries_delta: int = 0,
+        ts_epoch: Optional[int] = None
+    ) -> Dict:
+        """Transaction item adjusting a patient's running progress totals"""
+        add_clauses = ['sum_efficacy :s']
+        expr_attrs = {'#b': BACKFILLED}
+        expr_values = {':s': Decimal(str(efficacy_delta))}
+        
+        if entries_delta:
+            add_clauses.append('n_entries :n')
+            expr_values[':n'] = entries_delta
+        
+        for i, (effect, delta) in enumerate(side_effect_deltas.items()):
+            if delta:
+                add_clauses.append(f'#e{i} :e{i}')
+                expr_attrs[f'#e{i}'] = SIDE_EFFECT_PREFIX + effect
+                expr_values[f':e{i}'] = delta
+        
+        update_expr = 'ADD ' + ', '.join(add_clauses)
+        if ts_epoch is not None:
+            update_expr += ' SET first_ts_epoch = if_not_exists(first_ts_epoch, :ts), last_ts_epoch = :ts'
+            expr_values[':ts'] = ts_epoch
+        
+        return {
+            'Update': {
+                'TableName': self.table_name,
+                'Key': to_attribute_map({'patient_id': patient_id, 'timestamp': STATS_TIMESTAMP}),
+                'UpdateExpression': update_expr,
+                'ConditionExpression': 'attribute_exists(#b)',
+                'ExpressionAttributeNames': expr_attrs,
+                'ExpressionAttributeValues': to_attribute_map(expr_values)
+            }
+        }
+    
     def analyze_progress(self, patient_id: str) -> Dict:
         """Analyze patient's treatment progress"""
         try:
-            progress_entries = self.get_patient_progress(patient_id)
+            stats = self.table.get_item(
+                Key={'patient_id': patient_id, 'timestamp': STATS_TIMESTAMP}
+            ).get('Item')
             
-            if not progress_entries:
-                return {
-                    'status': 'No progress data available',
-                    'trend': None,
-                    'average_efficacy': None
-                }
+            # Histories whose totals have not been backfilled yet are analyzed in full
+            if stats is None or not stats.get(BACKFILLED):
+                return self._analyze_entries(self.get_patient_progress(patient_id))
+            
+            total_entries = int(stats.get('n_entries', 0))
+            if not total_entries:
+                return self._analyze_entries([])
             
-            # Calculate metrics
-            efficacy_scores = [entry['efficacy_score'] for entry in progress_entries]
-            avg_efficacy = sum(efficacy_scores) / len(efficacy_scores)
+            # Only the two newest entries are needed for the trend
+            recent_entries = self.table.query(
+                KeyConditionExpression='patient_id = :pid AND #ts < :stats',
+                ExpressionAttributeNames={'#ts': 'timestamp'},
+                ExpressionAttributeValues={':pid': patient_id, ':stats': STATS_TIMESTAMP},
+                ScanIndexForward=False,
+                Limit=2
+            ).get('Items', [])
+            
+            sum_efficacy = float(stats['sum_efficacy'])
+            avg_efficacy = sum_efficacy / total_entries
             
             # Determine trend
-            if len(efficacy_scores) >= 2:
-                recent_avg = sum(efficacy_scores[-2:]) / 2
-                older_avg = sum(efficacy_scores[:-2]) / (len(efficacy_scores) - 2) if len(efficacy_scores) > 2 else efficacy_scores[0]
+            if total_entries >= 2:
+                recent_sum = sum(float(entry['efficacy_score']) for entry in recent_entries)
+                recent_avg = recent_sum / 2
+                older_avg = (
+                    (sum_efficacy - recent_sum) / (total_entries - 2) if total_entries > 2
+                    else float(recent_entries[-1]['efficacy_score'])
+                )
                 trend = 'improving' if recent_avg > older_avg else 'declining' if recent_avg < older_avg else 'stable'
             else:
                 trend = 'insufficient data'
             
-            # Analyze side effects
-            side_effects_freq = {}
-            for entry in progress_entries:
-                for effect in entry.get('side_effects', []):
-                    side_effects_freq[effect] = side_effects_freq.get(effect, 0) + 1
+            side_effects_freq = {
+                key[len(SIDE_EFFECT_PREFIX):]: int(count)
+                for key, count in stats.items()
+                if key.startswith(SIDE_EFFECT_PREFIX) and count
+            }
             
             return {
                 'status': 'active',
                 'trend': trend,
                 'average_efficacy': avg_efficacy,
-                'total_entries': len(progress_entries),
-                'latest_entry': progress_entries[-1],
+                'total_entries': total_entries,
+                'latest_entry': recent_entries[0],
                 'side_effects_summary': side_effects_freq,
-                'treatment_duration': (
-                    datetime.fromisoformat(progress_entries[-1]['timestamp']) -
-                    datetime.fromisoformat(progress_entries[0]['timestamp'])
-                ).days
+                'treatment_duration': int(stats['last_ts_epoch'] - stats['first_ts_epoch']) // SECONDS_PER_DAY
             }
             
         except Exception as e:
-            logger.error(f"Error analyzing progress: {str(e)}")
+            logger.error("Error analyzing progress: %s", e)
             raise
+    
+    def _analyze_entries(self, progress_entries: List[Dict]) -> Dict:
+        """Analyze a full, time-ordered progress history"""
+        if not progress_entries:
+            return {
+                'status': 'No progress data available',
+                'trend': None,
+                'average_efficacy': None
+            }
+        
+        # Calculate metrics
+        efficacy_scores = np.fromiter(
+            (entry['efficacy_score'] for entry in progress_entries),
+            dtype=np.float64,
+            count=len(progress_entries)
+        )
+        avg_efficacy = float(efficacy_scores.mean())
+        
+        # Determine trend
+        if efficacy_scores.size >= 2:
+            recent_avg = float(efficacy_scores[-2:].mean())
+            older_avg = float(efficacy_scores[:-2].mean()) if efficacy_scores.size > 2 else float(efficacy_scores[0])
+            trend = 'improving' if recent_avg > older_avg else 'declining' if recent_avg < older_avg else 'stable'
+        else:
+            trend = 'insufficient data'
+        
+        # Analyze side effects
+        side_effects_freq = dict(Counter(
+            effect for entry in progress_entries for effect in entry.get('side_effects', ())
+        ))
+        
+        return {
+            'status': 'active',
+            'trend': trend,
+            'average_efficacy': avg_efficacy,
+            'total_entries': len(progress_entries),
+            'latest_entry': progress_entries[-1],
+            'side_effects_summary': side_effects_freq,
+            'treatment_duration': self._duration_days(progress_entries[0], progress_entries[-1])
+        }
+    
+    @staticmethod
+    def _entry_epoch(entry: Dict) -> int:
+        """Epoch seconds of an entry, derived from its timestamp for entries without ts_epoch"""
+        if 'ts_epoch' in entry:
+            return int(entry['ts_epoch'])
+        return int(datetime.fromisoformat(entry['timestamp']).replace(tzinfo=timezone.utc).timestamp())
+    
+    @staticmethod
+    def _duration_days(first_entry: Dict, last_entry: Dict) -> int:
+        """Whole days between two entries, from stored epochs when both have them"""
+        if 'ts_epoch' in first_entry and 'ts_epoch' in last_entry:
+            return int(last_entry['ts_epoch'] - first_entry['ts_epoch']) // SECONDS_PER_DAY
+        return (
+            datetime.fromisoformat(last_entry['timestamp']) -
+            datetime.fromisoformat(first_entry['timestamp'])
+        ).days
@@ -1,12 +1,13 @@
 import os
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-import requests
+import httpx
 from services.utils.logging import setup_logging
 
-app = FastAPI()
-logger = setup_logging()
+app = FastAPI(default_response_class=ORJSONResponse)
+logger = setup_logging('powerbi_integration')
 
 # Add CORS middleware
 app.add_middleware(
@@ -22,18 +23,29 @@ POWER_BI_DATASET_ID = os.getenv("POWER_BI_DATASET_ID")
 POWER_BI_TABLE_NAME = os.getenv("POWER_BI_TABLE_NAME")
 POWER_BI_ACCESS_TOKEN = os.getenv("POWER_BI_ACCESS_TOKEN")
 
+# One pooled client keeps TLS sessions to Power BI alive across requests
+client = httpx.AsyncClient(
+    base_url=POWER_BI_API_URL,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+    timeout=10.0
+)
+
 class PowerBIData(BaseModel):
     rows: list
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await client.aclose()
+
 @app.post("/update-powerbi")
 async def update_powerbi(data: PowerBIData):
     try:
-        url = f"{POWER_BI_API_URL}/datasets/{POWER_BI_DATASET_ID}/tables/{POWER_BI_TABLE_NAME}/rows"
+        url = f"/datasets/{POWER_BI_DATASET_ID}/tables/{POWER_BI_TABLE_NAME}/rows"
         headers = {
             "Authorization": f"Bearer {POWER_BI_ACCESS_TOKEN}",
             "Content-Type": "application/json"
         }
-        response = requests.post(url, headers=headers, json=data.dict())
+        response = await client.post(url, headers=headers, content=data.model_dump_json())
         
         if response.status_code == 200:
             logger.info("Data successfully sent to Power BI")
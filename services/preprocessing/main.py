@@ -1,11 +1,17 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+import io
+import os
 import pandas as pd
+import numpy as np
 import boto3
+from botocore.config import Config
+from typing import Iterator, List, Tuple
 from services.utils.logging import setup_logging
 
-app = FastAPI()
-logger = setup_logging()
+app = FastAPI(default_response_class=ORJSONResponse)
+logger = setup_logging('preprocessing')
 
 # Add CORS middleware
 app.add_middleware(
@@ -16,30 +22,111 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-s3 = boto3.client('s3')
+s3 = boto3.client(
+    's3',
+    config=Config(
+        region_name=os.getenv('AWS_REGION'),
+        max_pool_connections=64,
+        tcp_keepalive=True,
+        retries={'mode': 'adaptive', 'max_attempts': 5},
+        s3={'addressing_style': 'virtual'}
+    )
+)
+
+# Files are streamed in row chunks and written back as multipart uploads
+CHUNK_ROWS = int(os.getenv('PREPROCESS_CHUNK_ROWS', 100_000))
+PART_SIZE = 8 * 1024 * 1024  # S3 parts must be at least 5 MB, except the last
+
+def read_chunks(bucket_name: str, key: str) -> Iterator[pd.DataFrame]:
+    """Stream an S3 CSV as DataFrame chunks with missing-value rows removed"""
+    body = s3.get_object(Bucket=bucket_name, Key=key)['Body']
+    for chunk in pd.read_csv(body, chunksize=CHUNK_ROWS):
+        yield chunk.dropna()
+
+def column_stats(bucket_name: str, key: str) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """First pass: numeric columns with their mean and sample std, merged chunk by chunk"""
+    columns, count, mean, m2 = None, 0, 0.0, 0.0
+    for chunk in read_chunks(bucket_name, key):
+        if columns is None:
+            columns = list(chunk.select_dtypes(include=['float64', 'int64']).columns)
+        values = chunk[columns].to_numpy(dtype=np.float64)
+        n = len(values)
+        if not n:
+            continue
+        chunk_mean = values.mean(axis=0)
+        chunk_m2 = ((values - chunk_mean) ** 2).sum(axis=0)
+        
+        # Chan et al. parallel merge of Welford accumulators
+        delta = chunk_mean - mean
+        total = count + n
+        mean = mean + delta * n / total
+        m2 = m2 + chunk_m2 + delta ** 2 * count * n / total
+        count = total
+    
+    std = np.sqrt(m2 / (count - 1)) if count > 1 else np.nan
+    return columns or [], mean, std
+
+def standardize(values: np.ndarray, mean: np.ndarray, std: np.ndarray) -> np.ndarray:
+    """Z-score each column in place with precomputed statistics"""
+    values -= mean
+    values /= std
+    return values
+
+def upload_chunks(bucket_name: str, key: str, chunks: Iterator[pd.DataFrame]):
+    """Second pass: write CSV chunks to S3 as a multipart upload"""
+    upload_id = s3.create_multipart_upload(Bucket=bucket_name, Key=key)['UploadId']
+    try:
+        parts = []
+        buffer = io.BytesIO()
+        
+        def flush():
+            part_number = len(parts) + 1
+            response = s3.upload_part(
+                Bucket=bucket_name, Key=key, UploadId=upload_id,
+                PartNumber=part_number, Body=buffer.getvalue()
+            )
+            parts.append({'PartNumber': part_number, 'ETag': response['ETag']})
+            buffer.seek(0)
+            buffer.truncate()
+        
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(buffer, index=False, header=(i == 0))
+            if buffer.tell() >= PART_SIZE:
+                flush()
+        if buffer.tell() or not parts:
+            flush()
+        
+        s3.complete_multipart_upload(
+            Bucket=bucket_name, Key=key, UploadId=upload_id,
+            MultipartUpload={'Parts': parts}
+        )
+    except Exception:
+        s3.abort_multipart_upload(Bucket=bucket_name, Key=key, UploadId=upload_id)
+        raise
 
 @app.post("/preprocess/{file_name}")
 async def preprocess_data(file_name: str):
     try:
-        # Download file from S3
         bucket_name = 'your-s3-bucket-name'
-        response = s3.get_object(Bucket=bucket_name, Key=f'raw_data/{file_name}')
-        df = pd.read_csv(response['Body'])
+        raw_file_name = f'raw_data/{file_name}'
         
         # Perform preprocessing steps
-        # Example: Remove rows with missing values
-        df = df.dropna()
+        # Example: Remove rows with missing values, then normalize numerical columns
+        numerical_columns, mean, std = column_stats(bucket_name, raw_file_name)
         
-        # Example: Normalize numerical columns
-        numerical_columns = df.select_dtypes(include=['float64', 'int64']).columns
-        df[numerical_columns] = (df[numerical_columns] - df[numerical_columns].mean()) / df[numerical_columns].std()
+        def normalized_chunks():
+            for chunk in read_chunks(bucket_name, raw_file_name):
+                chunk[numerical_columns] = standardize(
+                    chunk[numerical_columns].to_numpy(dtype=np.float64), mean, std
+                )
+                yield chunk
         
         # Save preprocessed data back to S3
         preprocessed_file_name = f'preprocessed_data/{file_name}'
-        s3.put_object(Bucket=bucket_name, Key=preprocessed_file_name, Body=df.to_csv(index=False))
+        upload_chunks(bucket_name, preprocessed_file_name, normalized_chunks())
         
         logger.info(f"Preprocessed file: {file_name}")
         return {"message": "Data preprocessed successfully"}
     except Exception as e:
         logger.error(f"Error preprocessing data: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
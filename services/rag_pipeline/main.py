@@ -1,21 +1,34 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import boto3
+from botocore.config import Config
+import faiss
 from botocore.exceptions import ClientError
 from services.utils.logging import setup_logging
+from services.utils.responses import orjson_default
+import gzip
+import hashlib
+import math
+import numpy as np
+import orjson
+import json
 import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 
 # Langchain imports
 from langchain.llms import OpenAI
 from langchain.chains import VectorDBQA
-from langchain.document_loaders import S3FileLoader
 from langchain.embeddings import OpenAIEmbeddings
 from langchain.vectorstores import FAISS
-from langchain.text_splitter import CharacterTextSplitter
+from langchain.docstore import InMemoryDocstore
+from langchain.docstore.document import Document
 
-app = FastAPI()
-logger = setup_logging()
+app = FastAPI(default_response_class=ORJSONResponse)
+logger = setup_logging('rag_pipeline')
 
 # Add CORS middleware
 app.add_middleware(
@@ -27,7 +40,16 @@ app.add_middleware(
 )
 
 # Initialize AWS clients
-s3 = boto3.client('s3')
+s3 = boto3.client(
+    's3',
+    config=Config(
+        region_name=os.getenv('AWS_REGION'),
+        max_pool_connections=64,
+        tcp_keepalive=True,
+        retries={'mode': 'adaptive', 'max_attempts': 5},
+        s3={'addressing_style': 'virtual'}
+    )
+)
 dynamodb = boto3.resource('dynamodb')
 patients_table = dynamodb.Table('Patients')
 
@@ -35,29 +57,74 @@ patients_table = dynamodb.Table('Patients')
 openai_api_key = os.getenv("OPENAI_API_KEY")
 llm = OpenAI(temperature=0, openai_api_key=openai_api_key)
 
+class CachedOpenAIEmbeddings(OpenAIEmbeddings):
+    """OpenAIEmbeddings that keeps each document embedding on disk under its content hash"""
+    cache_dir: str = os.getenv("EMBEDDING_CACHE_DIR", "embeddings_cache")
+
+    def embed_documents(self, texts: List[str], chunk_size: Optional[int] = 0) -> List[List[float]]:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        paths = [
+            os.path.join(self.cache_dir, hashlib.sha256(text.encode()).hexdigest() + ".npy")
+            for text in texts
+        ]
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        misses = []
+        for i, path in enumerate(paths):
+            if os.path.exists(path):
+                vectors[i] = np.load(path).tolist()
+            else:
+                misses.append(i)
+        
+        # Only texts never embedded before go to the API, in one batch
+        if misses:
+            computed = super().embed_documents([texts[i] for i in misses], chunk_size=chunk_size)
+            for i, vector in zip(misses, computed):
+                np.save(paths[i], np.asarray(vector, dtype=np.float32))
+                vectors[i] = vector
+        return vectors
+
 # Initialize vector store
-embeddings = OpenAIEmbeddings(openai_api_key=openai_api_key)
+embeddings = CachedOpenAIEmbeddings(openai_api_key=openai_api_key)
 vector_store = None
 
+# Flat search is multi-threaded across all cores; the AVX2 wheel vectorizes distances
+faiss.omp_set_num_threads(int(os.getenv("FAISS_THREADS", os.cpu_count() or 1)))
+logger.info(f"FAISS compile options: {faiss.get_compile_options()}")
+
+# Full re-syncs read the table with a parallel segmented scan
+SCAN_SEGMENTS = min((os.cpu_count() or 1) * 2, 8)
+
+# The index is persisted so restarts and updates only embed rows that changed
+INDEX_DIR = os.getenv("RAG_INDEX_DIR", "patients.faiss")
+ROW_HASHES_FILE = "row_hashes.pkl"
+
+# Past this many vectors the flat index is retrained as IVF; nprobe trades recall for speed
+IVF_MIN_VECTORS = int(os.getenv("RAG_IVF_MIN_VECTORS", 10000))
+IVF_NPROBE = int(os.getenv("RAG_IVF_NPROBE", 16))
+row_hashes: Dict[str, str] = {}
+# Hash of the last snapshot exported to S3, so unchanged exports are skipped
+export_hash: Optional[str] = None
+
 class Query(BaseModel):
     question: str
 
 @app.on_event("startup")
 async def startup_event():
-    global vector_store
+    global vector_store, row_hashes
     try:
-        # Load documents from S3
-        bucket_name = os.getenv("S3_BUCKET_NAME")
-        loader = S3FileLoader(bucket_name, "patient_data.txt")
-        documents = loader.load()
+        if os.path.isdir(INDEX_DIR):
+            vector_store = FAISS.load_local(INDEX_DIR, embeddings)
+            with open(os.path.join(INDEX_DIR, ROW_HASHES_FILE), 'rb') as f:
+                row_hashes = pickle.load(f)
+            logger.info(f"Vector store loaded with {len(row_hashes)} patients")
+        else:
+            reindex_patient_data()
+            logger.info("Vector store initialized successfully")
         
-        # Split documents
-        text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=0)
-        texts = text_splitter.split_documents(documents)
-        
-        # Create vector store
-        vector_store = FAISS.from_documents(texts, embeddings)
-        logger.info("Vector store initialized successfully")
+        # Page in the index and start the OpenMP pool before the first real query;
+        # a raw vector search avoids paying for a query embedding
+        if vector_store is not None:
+            vector_store.index.search(np.zeros((1, vector_store.index.d), dtype=np.float32), 1)
     except Exception as e:
         logger.error(f"Error initializing vector store: {str(e)}")
         raise
@@ -77,29 +144,154 @@ async def query_rag(query: Query):
         logger.error(f"Error processing RAG query: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def row_hash(patient: Dict) -> str:
+    """Content hash of a DynamoDB item, used to skip re-embedding unchanged rows"""
+    return hashlib.sha256(json.dumps(patient, sort_keys=True, default=str).encode()).hexdigest()
+
+def new_vector_store(dimension: int) -> FAISS:
+    """Empty vector store whose index keeps vectors as float16; queries stay float32"""
+    index = faiss.IndexIDMap2(
+        faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_L2)
+    )
+    return FAISS(embeddings, index, InMemoryDocstore({}), {})
+
+def build_ivf_index(vectors: np.ndarray, positions: np.ndarray) -> faiss.Index:
+    """Train an IVF index over the given vectors, keeping their positions as ids"""
+    dimension = vectors.shape[1]
+    nlist = int(4 * math.sqrt(len(vectors)))
+    quantizer = faiss.IndexFlatL2(dimension)
+    index = faiss.IndexIVFScalarQuantizer(
+        quantizer, dimension, nlist, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_L2
+    )
+    index.train(vectors)
+    index.add_with_ids(vectors, positions)
+    index.nprobe = IVF_NPROBE
+    return index
+
+def maybe_switch_to_ivf():
+    """Replace the flat index with IVF once the corpus is large enough to train it"""
+    index = vector_store.index
+    if not isinstance(index, faiss.IndexIDMap2) or index.ntotal < IVF_MIN_VECTORS:
+        return
+    vectors = faiss.downcast_index(index.index).reconstruct_n(0, index.ntotal)
+    positions = faiss.vector_to_array(index.id_map).astype(np.int64)
+    vector_store.index = build_ivf_index(vectors, positions)
+    logger.info(f"Vector store switched to IVF over {index.ntotal} vectors")
+
+# Both index types carry explicit ids, so positions are never renumbered after a delete
+def add_to_store(texts: List[str], vectors: List[List[float]], metadatas: List[Dict], ids: List[str]):
+    """Add embedded documents under fresh index positions"""
+    start = max(vector_store.index_to_docstore_id, default=-1) + 1
+    positions = np.arange(start, start + len(ids), dtype=np.int64)
+    vector_store.index.add_with_ids(np.asarray(vectors, dtype=np.float32), positions)
+    vector_store.docstore.add({
+        doc_id: Document(page_content=text, metadata=metadata)
+        for doc_id, text, metadata in zip(ids, texts, metadatas)
+    })
+    vector_store.index_to_docstore_id.update(zip(positions.tolist(), ids))
+
+def delete_from_store(ids: List[str]):
+    """Remove documents and their vectors from the store"""
+    targets = set(ids)
+    positions = [
+        position for position, doc_id in vector_store.index_to_docstore_id.items()
+        if doc_id in targets
+    ]
+    vector_store.index.remove_ids(np.array(positions, dtype=np.int64))
+    vector_store.docstore.delete(list(targets))
+    for position in positions:
+        del vector_store.index_to_docstore_id[position]
+
+def save_index():
+    """Persist the vector store and its row hashes side by side"""
+    vector_store.save_local(INDEX_DIR)
+    with open(os.path.join(INDEX_DIR, ROW_HASHES_FILE), 'wb') as f:
+        pickle.dump(row_hashes, f)
+
+def apply_patient_changes(patients: List[Dict], removed_ids: List[str] = ()) -> int:
+    """Embed new or changed patients and drop removed ones, leaving the rest of the index alone"""
+    global vector_store
+    
+    changed = {}
+    for patient in patients:
+        digest = row_hash(patient)
+        if row_hashes.get(patient['id']) != digest:
+            changed[patient['id']] = (str(patient), digest)
+    
+    stale_ids = [patient_id for patient_id in (*changed, *removed_ids) if patient_id in row_hashes]
+    if stale_ids and vector_store is not None:
+        delete_from_store(stale_ids)
+    for patient_id in removed_ids:
+        row_hashes.pop(patient_id, None)
+    
+    if changed:
+        ids = list(changed)
+        texts = [text for text, _ in changed.values()]
+        metadatas = [{'patient_id': patient_id} for patient_id in ids]
+        vectors = embeddings.embed_documents(texts)
+        if vector_store is None:
+            vector_store = new_vector_store(len(vectors[0]))
+        add_to_store(texts, vectors, metadatas, ids)
+        maybe_switch_to_ivf()
+        row_hashes.update((patient_id, digest) for patient_id, (_, digest) in changed.items())
+    
+    if (changed or stale_ids) and vector_store is not None:
+        save_index()
+    return len(changed)
+
+def scan_segment(segment: int) -> List[Dict]:
+    """Read every page of one parallel scan segment"""
+    # The low-level client is thread-safe; the resource's client still deserializes items
+    client = patients_table.meta.client
+    items = []
+    scan_kwargs = {
+        'TableName': patients_table.name,
+        'Segment': segment,
+        'TotalSegments': SCAN_SEGMENTS
+    }
+    while True:
+        response = client.scan(**scan_kwargs)
+        items.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return items
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def scan_patients() -> List[Dict]:
+    """Read all patients, one thread per scan segment"""
+    with ThreadPoolExecutor(max_workers=SCAN_SEGMENTS) as pool:
+        return [item for segment in pool.map(scan_segment, range(SCAN_SEGMENTS)) for item in segment]
+
+def reindex_patient_data():
+    """Export all patients to S3 and bring the vector store in line with DynamoDB"""
+    global export_hash
+    
+    # Fetch all patient data from DynamoDB
+    patients = scan_patients()
+    
+    # Prepare data for S3 as gzipped JSON lines; skip the upload when nothing changed
+    snapshot = b"\n".join(orjson.dumps(patient, default=orjson_default) for patient in patients)
+    snapshot_hash = hashlib.sha256(snapshot).hexdigest()
+    if snapshot_hash != export_hash:
+        bucket_name = os.getenv("S3_BUCKET_NAME")
+        s3.put_object(
+            Bucket=bucket_name,
+            Key="patient_data.jsonl.gz",
+            Body=gzip.compress(snapshot, compresslevel=1),
+            ContentType="application/x-ndjson",
+            ContentEncoding="gzip",
+            Metadata={"content-hash": snapshot_hash}
+        )
+        export_hash = snapshot_hash
+    
+    current_ids = {patient['id'] for patient in patients}
+    removed_ids = [patient_id for patient_id in row_hashes if patient_id not in current_ids]
+    return apply_patient_changes(patients, removed_ids)
+
 @app.post("/update_patient_data")
 async def update_patient_data():
     try:
-        # Fetch all patient data from DynamoDB
-        response = patients_table.scan()
-        patients = response['Items']
-        
-        # Prepare data for S3
-        patient_data = "\n".join([str(patient) for patient in patients])
-        
-        # Upload to S3
-        bucket_name = os.getenv("S3_BUCKET_NAME")
-        s3.put_object(Bucket=bucket_name, Key="patient_data.txt", Body=patient_data)
-        
-        # Reinitialize vector store
-        global vector_store
-        loader = S3FileLoader(bucket_name, "patient_data.txt")
-        documents = loader.load()
-        text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=0)
-        texts = text_splitter.split_documents(documents)
-        vector_store = FAISS.from_documents(texts, embeddings)
-        
-        logger.info("Patient data updated and vector store reinitialized")
+        embedded = reindex_patient_data()
+        logger.info(f"Patient data updated, {embedded} patients re-embedded")
         return {"message": "Patient data updated successfully"}
     except Exception as e:
         logger.error(f"Error updating patient data: {str(e)}")
@@ -107,4 +299,5 @@ async def update_patient_data():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8006)
\ No newline at end of file
+    # Single worker: the vector store lives in process memory
+    uvicorn.run(app, host="0.0.0.0", port=8006, loop="uvloop", http="httptools")
\ No newline at end of file
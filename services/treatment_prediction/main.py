@@ -1,18 +1,30 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import numpy as np
 import logging
+from bisect import bisect_left
 from typing import Dict, Any
 import sys
 import os
 from decimal import Decimal
-import json
+import orjson
 
 # Configure logging
-logging.basicConfig(level=logging.DEBUG)
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper())
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
+
+# Mock prediction state shared across requests
+_rng = np.random.default_rng()
+_TREATMENTS = ("Treatment A", "Treatment B", "Treatment C")
+_CONFIDENCE_THRESHOLDS = (0.6, 0.8)
+_CONFIDENCE_LABELS = ("low", "medium", "high")
+
+def _confidence(efficacy: float) -> str:
+    """Map an efficacy score to its confidence label"""
+    return _CONFIDENCE_LABELS[bisect_left(_CONFIDENCE_THRESHOLDS, efficacy)]
 
 app.add_middleware(
     CORSMiddleware,
@@ -38,26 +50,35 @@ async def health_check():
 async def predict_treatment(patient_data: Dict[str, Any]):
     """Predict treatment based on patient data"""
     try:
-        logger.debug(f"Received prediction request: {json.dumps(patient_data, indent=2)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Received prediction request: %s", orjson.dumps(patient_data, option=orjson.OPT_INDENT_2).decode())
         
         # Mock prediction logic
-        treatments = ['Treatment A', 'Treatment B', 'Treatment C']
-        treatment = np.random.choice(treatments)
-        efficacy = float(np.random.uniform(0.6, 0.99))
+        treatment = _TREATMENTS[_rng.integers(len(_TREATMENTS))]
+        efficacy = float(_rng.uniform(0.6, 0.99))
         
         result = {
             "recommended_treatment": treatment,
             "efficacy": efficacy,
-            "confidence_level": "high" if efficacy > 0.8 else "medium" if efficacy > 0.6 else "low"
+            "confidence_level": _confidence(efficacy)
         }
         
-        logger.info(f"Generated prediction: {json.dumps(result, indent=2)}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Generated prediction: %s", orjson.dumps(result, option=orjson.OPT_INDENT_2).decode())
         return result
         
     except Exception as e:
-        logger.error(f"Error generating prediction: {str(e)}")
+        logger.error("Error generating prediction: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8083)
+    uvicorn.run(
+        "services.treatment_prediction.main:app",
+        host="0.0.0.0",
+        port=8083,
+        workers=int(os.getenv('WEB_CONCURRENCY', os.cpu_count() or 1)),
+        loop="uvloop",
+        http="httptools",
+        log_level="info"
+    )
@@ -1,12 +1,20 @@
 from typing import Type, Dict, Any, Optional, Callable
 from fastapi import HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response
 from pydantic import ValidationError
+import logging
 import traceback
+import orjson
 from .logging import get_logger
 
 logger = get_logger('error_handler')
 
+# The generic 500 body never changes, so it is serialized once
+INTERNAL_ERROR_BODY = orjson.dumps({'error': "Internal server error", 'status_code': 500})
+
+# Headers worth keeping in error logs; the rest is proxy noise
+LOG_HEADERS = ('user-agent', 'x-request-id', 'x-forwarded-for')
+
 class ServiceError(Exception):
     """Base class for service errors"""
     def __init__(self, message: str, status_code: int = 500, details: Optional[Dict[str, Any]] = None):
@@ -42,27 +50,35 @@ async def error_handler(request: Request, call_next: Callable):
     except Exception as exc:
         return handle_exception(exc, request)
 
-def handle_exception(exc: Exception, request: Request) -> JSONResponse:
-    """Handle different types of exceptions"""
-    
-    # Get request details for logging
-    request_details = {
+def get_request_details(request: Request) -> Dict[str, Any]:
+    """Request fields attached to error logs, with only the allow-listed headers"""
+    headers = request.headers
+    return {
         'method': request.method,
         'url': str(request.url),
         'client_host': request.client.host if request.client else None,
-        'headers': dict(request.headers)
+        'headers': {name: headers[name] for name in LOG_HEADERS if name in headers}
     }
+
+def handle_exception(exc: Exception, request: Request) -> Response:
+    """Handle different types of exceptions"""
+    
+    # Get request details for logging, only if the error will actually be logged
+    request_details = (
+        get_request_details(request) if logger.logger.isEnabledFor(logging.ERROR) else None
+    )
     
     if isinstance(exc, ServiceError):
         logger.error(
-            f"Service error: {exc.message}",
+            "Service error: %s",
+            exc.message,
             extra={
                 'status_code': exc.status_code,
                 'details': exc.details,
                 'request': request_details
             }
         )
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=exc.status_code,
             content={
                 'error': exc.message,
@@ -79,7 +95,7 @@ def handle_exception(exc: Exception, request: Request) -> JSONResponse:
                 'request': request_details
             }
         )
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=422,
             content={
                 'error': "Validation error",
@@ -90,13 +106,14 @@ def handle_exception(exc: Exception, request: Request) -> JSONResponse:
     
     elif isinstance(exc, HTTPException):
         logger.error(
-            f"HTTP error: {exc.detail}",
+            "HTTP error: %s",
+            exc.detail,
             extra={
                 'status_code': exc.status_code,
                 'request': request_details
             }
         )
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=exc.status_code,
             content={
                 'error': exc.detail,
@@ -111,12 +128,10 @@ def handle_exception(exc: Exception, request: Request) -> JSONResponse:
             exc_info=True,
             extra={'request': request_details}
         )
-        return JSONResponse(
+        return Response(
+            content=INTERNAL_ERROR_BODY,
             status_code=500,
-            content={
-                'error': "Internal server error",
-                'status_code': 500
-            }
+            media_type="application/json"
         )
 
 def setup_error_handling(app):
@@ -125,7 +140,8 @@ def setup_error_handling(app):
 
 # Example usage:
 # from fastapi import FastAPI
-# app = FastAPI()
+# from fastapi.responses import ORJSONResponse
+# app = FastAPI(default_response_class=ORJSONResponse)
 # setup_error_handling(app)
 #
 # @app.get("/items/{item_id}")
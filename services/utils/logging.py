@@ -1,17 +1,28 @@
+import atexit
 import os
+import re
 import sys
+import queue
 import logging
 import logging.handlers
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
-import json
-from functools import wraps
+from collections.abc import Mapping
+from typing import Any, Dict, Optional
+import orjson
+from prometheus_client import Counter
+from functools import lru_cache, wraps
 import time
 import traceback
 from contextlib import contextmanager  # Add this import
 from config import config
 
+def json_default(obj: Any) -> Any:
+    """Serialize values orjson does not handle natively, such as request header mappings"""
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    return str(obj)
+
 class CustomJsonFormatter(logging.Formatter):
     """Custom JSON formatter for structured logging"""
     
@@ -22,7 +33,7 @@ class CustomJsonFormatter(logging.Formatter):
     def format(self, record):
         """Format log record as JSON"""
         log_data = {
-            'timestamp': datetime.utcfromtimestamp(record.created).isoformat(),
+            'timestamp': datetime.utcfromtimestamp(record.created),
             'level': record.levelname,
             'logger': record.name,
             'message': record.getMessage(),
@@ -46,7 +57,34 @@ class CustomJsonFormatter(logging.Formatter):
         # Add custom fields
         log_data.update(self.kwargs)
         
-        return json.dumps(log_data)
+        return orjson.dumps(
+            log_data, default=json_default, option=orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+        ).decode()
+
+# Bound on records waiting for the listener thread, so a stalled sink cannot exhaust memory
+LOG_QUEUE_SIZE = 20000
+
+LOG_DROPPED = Counter(
+    'log_records_dropped_total',
+    'Log records dropped because the log queue was full',
+    ['logger']
+)
+
+class LocalQueueHandler(logging.handlers.QueueHandler):
+    """Queue records untouched; the JSON formatter runs on the listener thread"""
+
+    def enqueue(self, record):
+        # Drop rather than block the caller when the listener falls behind
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_DROPPED.labels(record.name).inc()
+
+    def prepare(self, record):
+        # The queue never leaves this process, so exc_info and args need not be flattened.
+        # Tracebacks are rendered on the listener thread; the cost is that the exception's
+        # frames (and their locals) stay alive until the record has been written.
+        return record
 
 def setup_logging(
     service_name: str,
@@ -64,10 +102,14 @@ def setup_logging(
     logger = logging.getLogger(service_name)
     logger.setLevel(getattr(logging, level.upper()))
     
+    # Repeat calls for the same service reuse its handlers instead of duplicating every line
+    if any(isinstance(handler, LocalQueueHandler) for handler in logger.handlers):
+        return logger
+    
     # Create console handler
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(CustomJsonFormatter(service=service_name))
-    logger.addHandler(console_handler)
+    handlers = [console_handler]
     
     # Create file handler if log file specified
     if log_file or log_config.get('file'):
@@ -77,36 +119,50 @@ def setup_logging(
         file_handler = logging.handlers.RotatingFileHandler(
             file_path,
             maxBytes=parse_size(log_config.get('max_size', '10MB')),
-            backupCount=log_config.get('backup_count', 5)
+            backupCount=log_config.get('backup_count', 5),
+            encoding='utf-8',
+            delay=True
         )
         file_handler.setFormatter(CustomJsonFormatter(service=service_name))
-        logger.addHandler(file_handler)
+        handlers.append(file_handler)
+    
+    # Callers only enqueue; formatting and I/O happen on the listener thread
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    logger.addHandler(LocalQueueHandler(log_queue))
     
     return logger
 
+_SIZE_UNITS = {'B': 1, 'KB': 1024, 'MB': 1024*1024, 'GB': 1024*1024*1024}
+_SIZE_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([KMG]?B)\s*$', re.IGNORECASE)
+
+@lru_cache(maxsize=None)
 def parse_size(size_str: str) -> int:
     """Parse size string (e.g., '10MB') to bytes"""
-    units = {'B': 1, 'KB': 1024, 'MB': 1024*1024, 'GB': 1024*1024*1024}
-    number = float(''.join(filter(str.isdigit, size_str)))
-    unit = ''.join(filter(str.isalpha, size_str)).upper()
-    return int(number * units[unit])
+    match = _SIZE_RE.match(size_str)
+    if not match:
+        raise ValueError(f"Invalid size: {size_str!r}")
+    number, unit = match.groups()
+    return int(float(number) * _SIZE_UNITS[unit.upper()])
 
 def log_execution_time(logger: logging.Logger):
     """Decorator to log function execution time"""
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            start_time = time.time()
+            start_time = time.perf_counter()
             try:
                 result = func(*args, **kwargs)
-                execution_time = time.time() - start_time
+                execution_time = time.perf_counter() - start_time
                 logger.info(
                     f"Function {func.__name__} executed in {execution_time:.2f} seconds",
                     extra={'execution_time': execution_time}
                 )
                 return result
             except Exception as e:
-                execution_time = time.time() - start_time
+                execution_time = time.perf_counter() - start_time
                 logger.error(
                     f"Function {func.__name__} failed after {execution_time:.2f} seconds",
                     exc_info=True,
@@ -116,12 +172,24 @@ def log_execution_time(logger: logging.Logger):
         return wrapper
     return decorator
 
+def log_event(logger: logging.Logger, event_type: str, event_data: Dict[str, Any]):
+    """Log a structured event; the formatter serializes it once"""
+    logger.info(event_type, extra={'extra_data': {'event_type': event_type, 'data': event_data}})
+
+def log_error(logger: logging.Logger, error_message: str):
+    """Log a structured error event"""
+    logger.error(error_message, extra={'extra_data': {'event_type': 'error'}})
+
 class ServiceLogger:
     """Logger class for services with context tracking"""
     
     def __init__(self, service_name: str):
         self.logger = setup_logging(service_name)
         self.context = {}
+        self._levels = {
+            name: (getattr(logging, name.upper()), getattr(self.logger, name))
+            for name in ('debug', 'info', 'warning', 'error', 'critical')
+        }
     
     def add_context(self, **kwargs):
         """Add context to all subsequent log messages"""
@@ -131,32 +199,42 @@ class ServiceLogger:
         """Clear the current context"""
         self.context.clear()
     
-    def _log(self, level: str, message: str, **kwargs):
+    def _log(self, level: str, message: str, *args, **kwargs):
         """Internal logging method"""
-        extra_data = {**self.context, **kwargs}
-        if 'extra_data' in kwargs:
-            extra_data.update(kwargs['extra_data'])
+        levelno, log_func = self._levels[level]
+        # Skip building extra data for records that would be dropped
+        if not self.logger.isEnabledFor(levelno):
+            return
+        
+        if not self.context and 'extra_data' not in kwargs:
+            # kwargs is already a fresh dict owned by this call; no merge needed
+            extra_data = kwargs
+        else:
+            extra_data = {**self.context, **kwargs}
+            if 'extra_data' in kwargs:
+                extra_data.update(kwargs['extra_data'])
         
-        getattr(self.logger, level)(
+        log_func(
             message,
+            *args,
             extra={'extra_data': extra_data},
             exc_info=kwargs.get('exc_info', None)
         )
     
-    def debug(self, message: str, **kwargs):
-        self._log('debug', message, **kwargs)
+    def debug(self, message: str, *args, **kwargs):
+        self._log('debug', message, *args, **kwargs)
     
-    def info(self, message: str, **kwargs):
-        self._log('info', message, **kwargs)
+    def info(self, message: str, *args, **kwargs):
+        self._log('info', message, *args, **kwargs)
     
-    def warning(self, message: str, **kwargs):
-        self._log('warning', message, **kwargs)
+    def warning(self, message: str, *args, **kwargs):
+        self._log('warning', message, *args, **kwargs)
     
-    def error(self, message: str, **kwargs):
-        self._log('error', message, **kwargs)
+    def error(self, message: str, *args, **kwargs):
+        self._log('error', message, *args, **kwargs)
     
-    def critical(self, message: str, **kwargs):
-        self._log('critical', message, **kwargs)
+    def critical(self, message: str, *args, **kwargs):
+        self._log('critical', message, *args, **kwargs)
     
     @contextmanager
     def context_scope(self, **kwargs):
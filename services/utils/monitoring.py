@@ -1,8 +1,9 @@
+import asyncio
 import time
 from typing import Dict, Any, Optional, List, Callable
 from dataclasses import dataclass
 from datetime import datetime
-import threading
+import psutil
 from prometheus_client import Counter, Histogram, Gauge, start_http_server
 from functools import wraps
 from .logging import get_logger
@@ -68,6 +69,11 @@ class ServiceMonitor:
     def __init__(self, service_name: str):
         self.service_name = service_name
         self.health_checks: Dict[str, Callable] = {}
+        # cpu_percent() measures since the previous call on the same handle,
+        # so keep one handle and prime it
+        self._process = psutil.Process()
+        self._process.cpu_percent(None)
+        self._resource_task: Optional[asyncio.Task] = None
         self.start_monitoring()
     
     def start_monitoring(self):
@@ -82,10 +88,16 @@ class ServiceMonitor:
     def track_request(self):
         """Decorator to track request metrics"""
         def decorator(func):
+            endpoint = func.__name__
+            # Bind label children once per endpoint instead of on every request
+            active = ACTIVE_REQUESTS.labels(self.service_name)
+            latency = REQUEST_LATENCY.labels(self.service_name, endpoint)
+            count_by_status: Dict[int, Any] = {}
+            
             @wraps(func)
             async def wrapper(*args, **kwargs):
-                start_time = time.time()
-                ACTIVE_REQUESTS.labels(self.service_name).inc()
+                active.inc()
+                start_time = time.perf_counter()
                 
                 try:
                     response = await func(*args, **kwargs)
@@ -96,15 +108,15 @@ class ServiceMonitor:
                     ERROR_COUNT.labels(self.service_name, type(e).__name__).inc()
                     raise
                 finally:
-                    ACTIVE_REQUESTS.labels(self.service_name).dec()
-                    duration = time.time() - start_time
-                    endpoint = func.__name__
-                    REQUEST_COUNT.labels(
-                        self.service_name, endpoint, 'GET', status
-                    ).inc()
-                    REQUEST_LATENCY.labels(
-                        self.service_name, endpoint
-                    ).observe(duration)
+                    active.dec()
+                    duration = time.perf_counter() - start_time
+                    count = count_by_status.get(status)
+                    if count is None:
+                        count = count_by_status[status] = REQUEST_COUNT.labels(
+                            self.service_name, endpoint, 'GET', status
+                        )
+                    count.inc()
+                    latency.observe(duration)
             
             return wrapper
         return decorator
@@ -112,18 +124,16 @@ class ServiceMonitor:
     def track_db_operation(self):
         """Decorator to track database operation metrics"""
         def decorator(func):
+            latency = DB_OPERATION_LATENCY.labels(self.service_name, func.__name__)
+            
             @wraps(func)
             async def wrapper(*args, **kwargs):
-                start_time = time.time()
+                start_time = time.perf_counter()
                 try:
                     result = await func(*args, **kwargs)
                     return result
                 finally:
-                    duration = time.time() - start_time
-                    operation = func.__name__
-                    DB_OPERATION_LATENCY.labels(
-                        self.service_name, operation
-                    ).observe(duration)
+                    latency.observe(time.perf_counter() - start_time)
             return wrapper
         return decorator
     
@@ -160,28 +170,34 @@ class ServiceMonitor:
     def update_resource_metrics(self):
         """Update resource usage metrics"""
         try:
-            import psutil
+            with self._process.oneshot():
+                memory = self._process.memory_info()
+                cpu_percent = self._process.cpu_percent(None)
             
-            # Update memory usage
-            memory = psutil.Process().memory_info()
             MEMORY_USAGE.labels(self.service_name).set(memory.rss)
-            
-            # Update CPU usage
-            cpu_percent = psutil.Process().cpu_percent()
             CPU_USAGE.labels(self.service_name).set(cpu_percent)
             
         except Exception as e:
             logger.error(f"Failed to update resource metrics: {str(e)}")
     
+    async def _monitor_resources(self, interval: int):
+        """Update resource metrics every interval seconds"""
+        while True:
+            self.update_resource_metrics()
+            await asyncio.sleep(interval)
+    
     def start_resource_monitoring(self, interval: int = 60):
-        """Start periodic resource monitoring"""
-        def monitor():
-            while True:
-                self.update_resource_metrics()
-                time.sleep(interval)
-        
-        thread = threading.Thread(target=monitor, daemon=True)
-        thread.start()
+        """Start periodic resource monitoring on the running event loop"""
+        if self._resource_task is None or self._resource_task.done():
+            self._resource_task = asyncio.get_running_loop().create_task(
+                self._monitor_resources(interval)
+            )
+    
+    def stop_resource_monitoring(self):
+        """Stop periodic resource monitoring"""
+        if self._resource_task is not None:
+            self._resource_task.cancel()
+            self._resource_task = None
 
 # Example usage:
 # monitor = ServiceMonitor('patient_management')
@@ -198,4 +214,11 @@ class ServiceMonitor:
 #     return await db.ping()
 #
 # monitor.register_health_check('database', check_db_connection)
-# monitor.start_resource_monitoring()
+#
+# @app.on_event("startup")
+# async def startup():
+#     monitor.start_resource_monitoring()
+#
+# @app.on_event("shutdown")
+# async def shutdown():
+#     monitor.stop_resource_monitoring()
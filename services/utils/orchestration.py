@@ -1,6 +1,8 @@
 from typing import Dict, List, Optional, Any
 import asyncio
+import random
 import aiohttp
+import orjson
 import logging
 from datetime import datetime
 from config import config
@@ -8,38 +10,91 @@ from .logging import get_logger
 
 logger = get_logger('orchestration')
 
+# A slow service should not hold up the whole health report
+HEALTH_CHECK_TIMEOUT = aiohttp.ClientTimeout(total=2)
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=10)
+# Per-host connection cap; batch workflows are gated to the same width
+CONNECTIONS_PER_HOST = 32
+# Exponential retry backoff in seconds, before jitter
+RETRY_BASE_DELAY = 1
+RETRY_MAX_DELAY = 30
+
 class ServiceOrchestrator:
     """Orchestrate service interactions and workflows"""
     
+    # Keep-alive pool shared by every orchestrator session in the process
+    _connector: Optional[aiohttp.TCPConnector] = None
+    
     def __init__(self):
         self.services = config.get('services', {})
         self.session: Optional[aiohttp.ClientSession] = None
     
+    @classmethod
+    def get_connector(cls) -> aiohttp.TCPConnector:
+        """Return the shared connector, creating it on first use"""
+        if cls._connector is None or cls._connector.closed:
+            cls._connector = aiohttp.TCPConnector(
+                limit=100,
+                limit_per_host=CONNECTIONS_PER_HOST,
+                keepalive_timeout=60,
+                enable_cleanup_closed=True
+            )
+        return cls._connector
+    
+    @classmethod
+    async def close_connector(cls):
+        """Close pooled connections; call once on application shutdown"""
+        if cls._connector is not None:
+            await cls._connector.close()
+            cls._connector = None
+    
     async def __aenter__(self):
-        """Create aiohttp session"""
-        self.session = aiohttp.ClientSession()
+        """Create aiohttp session on the shared connector"""
+        self.session = aiohttp.ClientSession(
+            connector=self.get_connector(),
+            connector_owner=False,
+            json_serialize=lambda obj: orjson.dumps(obj).decode(),
+            timeout=REQUEST_TIMEOUT
+        )
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        """Close aiohttp session"""
+        """Close aiohttp session; pooled connections stay open"""
         if self.session:
             await self.session.close()
     
     async def check_service_health(self, service_url: str) -> bool:
         """Check if a service is healthy"""
         try:
-            async with self.session.get(f"{service_url}/health") as response:
+            async with self.session.get(f"{service_url}/health", timeout=HEALTH_CHECK_TIMEOUT) as response:
                 return response.status == 200
         except Exception as e:
-            logger.error(f"Health check failed for {service_url}: {str(e)}")
+            logger.error("Health check failed for %s: %s", service_url, e)
             return False
     
     async def check_all_services(self) -> Dict[str, bool]:
         """Check health of all services"""
-        results = {}
-        for name, url in self.services.items():
-            results[name] = await self.check_service_health(url)
-        return results
+        statuses = await asyncio.gather(
+            *(self.check_service_health(url) for url in self.services.values()),
+            return_exceptions=True
+        )
+        return {name: status is True for name, status in zip(self.services, statuses)}
+    
+    async def _post(
+        self,
+        service: str,
+        path: str,
+        payload: Dict[str, Any],
+        error: str
+    ) -> Any:
+        """POST JSON to a service, raising with the given message on a non-200 reply"""
+        async with self.session.post(
+            f"{self.services[service]}{path}",
+            json=payload
+        ) as response:
+            if response.status != 200:
+                raise Exception(error)
+            return await response.json()
     
     async def process_patient(
         self,
@@ -47,34 +102,36 @@ class ServiceOrchestrator:
     ) -> Dict[str, Any]:
         """Process patient data through the complete workflow"""
         try:
-            # 1. Ingest patient data
-            async with self.session.post(
-                f"{self.services['data_ingestion']}/ingest/patient",
-                json=patient_data
-            ) as response:
-                if response.status != 200:
-                    raise Exception("Data ingestion failed")
-                ingestion_result = await response.json()
-            
-            # 2. Get treatment recommendation
-            async with self.session.post(
-                f"{self.services['treatment_prediction']}/predict",
-                json={
-                    "genomic_data": patient_data["genomic_data"],
-                    "medical_history": patient_data["medical_history"]
-                }
-            ) as response:
-                if response.status != 200:
-                    raise Exception("Treatment prediction failed")
-                prediction_result = await response.json()
+            # 1. Ingest patient data while 2. the recommendation is computed;
+            # only the record update depends on the prediction
+            ingestion = asyncio.create_task(self._post(
+                'data_ingestion',
+                '/ingest/patient',
+                patient_data,
+                "Data ingestion failed"
+            ))
+            try:
+                prediction_result = await self._post(
+                    'treatment_prediction',
+                    '/predict',
+                    {
+                        "genomic_data": patient_data["genomic_data"],
+                        "medical_history": patient_data["medical_history"]
+                    },
+                    "Treatment prediction failed"
+                )
+            except Exception:
+                ingestion.cancel()
+                raise
+            await ingestion
             
             # 3. Update patient record
-            async with self.session.post(
-                f"{self.services['patient_management']}/patients/{patient_data['id']}/treatments",
-                json={"treatment": prediction_result["recommended_treatment"]}
-            ) as response:
-                if response.status != 200:
-                    raise Exception("Patient update failed")
+            await self._post(
+                'patient_management',
+                f"/patients/{patient_data['id']}/treatments",
+                {"treatment": prediction_result["recommended_treatment"]},
+                "Patient update failed"
+            )
             
             return {
                 "status": "success",
@@ -84,20 +141,25 @@ class ServiceOrchestrator:
             }
         
         except Exception as e:
-            logger.error(f"Workflow failed for patient {patient_data['id']}: {str(e)}")
+            logger.error("Workflow failed for patient %s: %s", patient_data['id'], e)
             raise
     
     async def batch_process_patients(
         self,
         patients: List[Dict[str, Any]]
     ) -> Dict[str, Any]:
-        """Process multiple patients concurrently"""
-        tasks = []
-        for patient in patients:
-            task = asyncio.create_task(self.process_patient(patient))
-            tasks.append(task)
+        """Process multiple patients with bounded concurrency"""
+        semaphore = asyncio.Semaphore(CONNECTIONS_PER_HOST)
+        
+        async def run(patient):
+            async with semaphore:
+                return await self.process_patient(patient)
         
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        # gather keeps results in input order
+        results = await asyncio.gather(
+            *(run(patient) for patient in patients),
+            return_exceptions=True
+        )
         
         successful = []
         failed = []
@@ -123,41 +185,45 @@ class ServiceOrchestrator:
         failed_operations: List[Dict[str, Any]],
         max_retries: int = 3
     ) -> Dict[str, Any]:
-        """Retry failed operations"""
+        """Retry failed operations concurrently with jittered exponential backoff"""
         results = {
             "retried": [],
             "failed": []
         }
+        semaphore = asyncio.Semaphore(CONNECTIONS_PER_HOST)
         
-        for operation in failed_operations:
+        async def retry(operation):
             patient_id = operation["patient_id"]
-            retries = 0
             
-            while retries < max_retries:
+            for retries in range(1, max_retries + 1):
                 try:
-                    # Get patient data
-                    async with self.session.get(
-                        f"{self.services['patient_management']}/patients/{patient_id}"
-                    ) as response:
-                        if response.status != 200:
-                            raise Exception("Failed to get patient data")
-                        patient_data = await response.json()
-                    
-                    # Retry processing
-                    result = await self.process_patient(patient_data)
+                    async with semaphore:
+                        # Get patient data
+                        async with self.session.get(
+                            f"{self.services['patient_management']}/patients/{patient_id}"
+                        ) as response:
+                            if response.status != 200:
+                                raise Exception("Failed to get patient data")
+                            patient_data = await response.json()
+                        
+                        # Retry processing
+                        result = await self.process_patient(patient_data)
                     results["retried"].append(result)
-                    break
+                    return
                 
                 except Exception as e:
-                    retries += 1
                     if retries == max_retries:
                         results["failed"].append({
                             "patient_id": patient_id,
                             "error": str(e),
                             "retries": retries
                         })
-                    await asyncio.sleep(1)  # Wait before retrying
+                        return
+                    # Jitter keeps failed operations from retrying in lockstep
+                    delay = min(RETRY_BASE_DELAY * 2 ** (retries - 1), RETRY_MAX_DELAY)
+                    await asyncio.sleep(delay * random.uniform(0.5, 1.5))
         
+        await asyncio.gather(*(retry(operation) for operation in failed_operations))
         return results
 
 # Example usage:
@@ -170,3 +236,6 @@ class ServiceOrchestrator:
 #     
 #     # Retry failed operations
 #     retry_results = await orchestrator.retry_failed_operations(results["failed"])
+#
+# # On application shutdown
+# await ServiceOrchestrator.close_connector()
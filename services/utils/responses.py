@@ -0,0 +1,28 @@
+from decimal import Decimal
+from typing import Any
+import orjson
+from fastapi.responses import ORJSONResponse
+
+def orjson_default(obj: Any) -> Any:
+    """Serialize types orjson does not support natively"""
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+class DecimalORJSONResponse(ORJSONResponse):
+    """ORJSONResponse that also serializes DynamoDB Decimal values"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            default=orjson_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+
+# Example usage:
+# app = FastAPI(default_response_class=DecimalORJSONResponse)
+#
+# @app.get("/items/{item_id}")
+# async def get_item(item_id: str):
+#     item = (await table.get_item(Key={'id': item_id}))['Item']
+#     return DecimalORJSONResponse(item)  # skips jsonable_encoder
@@ -5,14 +5,37 @@ import json
 import logging
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from botocore.config import Config
 from botocore.exceptions import ClientError
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from config import config
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+REQUIRED_TABLES = ['patients', 'patient_progress', 'treatment_history']
+
+# Keep-alive connections are shared by the concurrent setup calls; adaptive
+# retries absorb control-plane throttling when tables are created together
+CLIENT_CONFIG = Config(
+    max_pool_connections=32,
+    tcp_keepalive=True,
+    retries={'mode': 'adaptive', 'max_attempts': 10}
+)
+
+@lru_cache(maxsize=None)
+def _get_session(region: str) -> boto3.session.Session:
+    """Return one boto3 session per region so credentials are resolved once"""
+    return boto3.session.Session(region_name=region)
+
+@lru_cache(maxsize=None)
+def _get_client(service: str, region: str, endpoint_url: Optional[str] = None):
+    """Return a shared client, reusing its connection pool across managers"""
+    return _get_session(region).client(service, endpoint_url=endpoint_url, config=CLIENT_CONFIG)
+
 class AWSResourceManager:
     """Manage AWS resources for the genomics system"""
     
@@ -21,15 +44,11 @@ class AWSResourceManager:
         self.endpoint_url = config.get('database.endpoint')
         
         # Initialize AWS clients
-        self.dynamodb = boto3.client(
-            'dynamodb',
-            region_name=self.region,
-            endpoint_url=self.endpoint_url
-        )
-        self.iam = boto3.client('iam', region_name=self.region)
+        self.dynamodb = _get_client('dynamodb', self.region, self.endpoint_url)
+        self.iam = _get_client('iam', self.region)
     
     def create_tables(self):
-        """Create required DynamoDB tables"""
+        """Create required DynamoDB tables with on-demand capacity"""
         tables = [
             {
                 'TableName': 'patients',
@@ -37,12 +56,22 @@ class AWSResourceManager:
                     {'AttributeName': 'id', 'KeyType': 'HASH'}
                 ],
                 'AttributeDefinitions': [
-                    {'AttributeName': 'id', 'AttributeType': 'S'}
+                    {'AttributeName': 'id', 'AttributeType': 'S'},
+                    {'AttributeName': 'entity_type', 'AttributeType': 'S'},
+                    {'AttributeName': 'created_at', 'AttributeType': 'S'}
                 ],
-                'ProvisionedThroughput': {
-                    'ReadCapacityUnits': 5,
-                    'WriteCapacityUnits': 5
-                }
+                # Lets list_patients Query patients by creation time instead of scanning
+                'GlobalSecondaryIndexes': [
+                    {
+                        'IndexName': 'active-index',
+                        'KeySchema': [
+                            {'AttributeName': 'entity_type', 'KeyType': 'HASH'},
+                            {'AttributeName': 'created_at', 'KeyType': 'RANGE'}
+                        ],
+                        'Projection': {'ProjectionType': 'ALL'}
+                    }
+                ],
+                'BillingMode': 'PAY_PER_REQUEST'
             },
             {
                 'TableName': 'patient_progress',
@@ -54,10 +83,7 @@ class AWSResourceManager:
                     {'AttributeName': 'patient_id', 'AttributeType': 'S'},
                     {'AttributeName': 'timestamp', 'AttributeType': 'S'}
                 ],
-                'ProvisionedThroughput': {
-                    'ReadCapacityUnits': 5,
-                    'WriteCapacityUnits': 5
-                }
+                'BillingMode': 'PAY_PER_REQUEST'
             },
             {
                 'TableName': 'treatment_history',
@@ -69,23 +95,30 @@ class AWSResourceManager:
                     {'AttributeName': 'patient_id', 'AttributeType': 'S'},
                     {'AttributeName': 'treatment_id', 'AttributeType': 'S'}
                 ],
-                'ProvisionedThroughput': {
-                    'ReadCapacityUnits': 5,
-                    'WriteCapacityUnits': 5
-                }
+                'BillingMode': 'PAY_PER_REQUEST'
             }
         ]
         
-        for table in tables:
-            try:
-                self.dynamodb.create_table(**table)
-                logger.info(f"Created table {table['TableName']}")
-            except ClientError as e:
-                if e.response['Error']['Code'] == 'ResourceInUseException':
-                    logger.info(f"Table {table['TableName']} already exists")
-                else:
-                    logger.error(f"Error creating table {table['TableName']}: {str(e)}")
-                    raise
+        # The CreateTable calls are independent, so overlap their round-trips
+        with ThreadPoolExecutor(max_workers=len(tables)) as executor:
+            list(executor.map(self._create_table, tables))
+    
+    def _create_table(self, table: Dict[str, Any]):
+        """Create one DynamoDB table, tolerating one that already exists"""
+        try:
+            self.dynamodb.create_table(**table)
+            # Return as soon as the table is ACTIVE so verify_setup sees it ready
+            self.dynamodb.get_waiter('table_exists').wait(
+                TableName=table['TableName'],
+                WaiterConfig={'Delay': 1, 'MaxAttempts': 30}
+            )
+            logger.info(f"Created table {table['TableName']}")
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ResourceInUseException':
+                logger.info(f"Table {table['TableName']} already exists")
+            else:
+                logger.error(f"Error creating table {table['TableName']}: {str(e)}")
+                raise
     
     def setup_iam_role(self):
         """Set up IAM role for the application"""
@@ -136,18 +169,22 @@ class AWSResourceManager:
         try:
             # Check DynamoDB tables
             tables = self.dynamodb.list_tables()['TableNames']
-            required_tables = ['patients', 'patient_progress', 'treatment_history']
             
-            for table in required_tables:
+            for table in REQUIRED_TABLES:
                 if table not in tables:
                     logger.error(f"Missing required table: {table}")
                     return False
-                
-                # Check table status
-                response = self.dynamodb.describe_table(TableName=table)
-                if response['Table']['TableStatus'] != 'ACTIVE':
-                    logger.error(f"Table {table} is not active")
-                    return False
+            
+            # Check table status
+            with ThreadPoolExecutor(max_workers=len(REQUIRED_TABLES)) as executor:
+                statuses = executor.map(
+                    lambda table: self.dynamodb.describe_table(TableName=table)['Table']['TableStatus'],
+                    REQUIRED_TABLES
+                )
+                for table, status in zip(REQUIRED_TABLES, statuses):
+                    if status != 'ACTIVE':
+                        logger.error(f"Table {table} is not active")
+                        return False
             
             # Check IAM role
             try:
@@ -166,8 +203,7 @@ class AWSResourceManager:
     def cleanup(self):
         """Clean up AWS resources"""
         # Delete tables
-        tables = ['patients', 'patient_progress', 'treatment_history']
-        for table in tables:
+        for table in REQUIRED_TABLES:
             try:
                 self.dynamodb.delete_table(TableName=table)
                 logger.info(f"Deleted table {table}")
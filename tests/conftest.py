@@ -30,7 +30,7 @@ def mock_dynamodb_client():
             TableName='patients',
             KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
             AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
-            ProvisionedThroughput={'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
+            BillingMode='PAY_PER_REQUEST'
         )
         
         client.create_table(
@@ -43,7 +43,7 @@ def mock_dynamodb_client():
                 {'AttributeName': 'patient_id', 'AttributeType': 'S'},
                 {'AttributeName': 'timestamp', 'AttributeType': 'S'}
             ],
-            ProvisionedThroughput={'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
+            BillingMode='PAY_PER_REQUEST'
         )
         
         yield client
@@ -0,0 +1,95 @@
+import io
+import pytest
+import numpy as np
+import pandas as pd
+import boto3
+from moto import mock_s3
+from fastapi.testclient import TestClient
+
+BUCKET = 'your-s3-bucket-name'
+
+@pytest.fixture
+def s3(monkeypatch):
+    """Point preprocessing at a mocked bucket, streaming in small row chunks"""
+    # moto does not accept the checksums newer botocore adds to uploads by default
+    monkeypatch.setenv('AWS_REQUEST_CHECKSUM_CALCULATION', 'when_required')
+    with mock_s3():
+        from services.preprocessing import main
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket=BUCKET)
+        monkeypatch.setattr(main, 's3', client)
+        monkeypatch.setattr(main, 'CHUNK_ROWS', 7)
+        yield client
+
+def raw_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        'age': rng.integers(18, 90, rows),
+        'score': rng.normal(5, 2, rows),
+        'gene': rng.choice(['BRCA1', 'BRCA2', 'TP53'], rows)
+    })
+    frame.loc[::10, 'score'] = np.nan
+    return frame
+
+def put_csv(s3, key: str, frame: pd.DataFrame):
+    s3.put_object(Bucket=BUCKET, Key=key, Body=frame.to_csv(index=False))
+
+def read_csv(s3, key: str) -> pd.DataFrame:
+    return pd.read_csv(io.BytesIO(s3.get_object(Bucket=BUCKET, Key=key)['Body'].read()))
+
+@pytest.mark.unit
+class TestChunkedPreprocessing:
+    """Streaming preprocessing against a mocked S3 bucket"""
+
+    def test_column_stats_match_whole_file(self, s3):
+        from services.preprocessing.main import column_stats
+        frame = raw_frame(100)
+        put_csv(s3, 'raw_data/stats.csv', frame)
+
+        columns, mean, std = column_stats(BUCKET, 'raw_data/stats.csv')
+
+        expected = frame.dropna()[['age', 'score']]
+        assert columns == ['age', 'score']
+        np.testing.assert_allclose(mean, expected.mean().to_numpy())
+        np.testing.assert_allclose(std, expected.std().to_numpy())
+
+    def test_preprocess_standardizes_every_chunk(self, s3):
+        from services.preprocessing.main import app
+        frame = raw_frame(100)
+        put_csv(s3, 'raw_data/patients.csv', frame)
+
+        response = TestClient(app).post('/preprocess/patients.csv')
+
+        assert response.status_code == 200
+        output = read_csv(s3, 'preprocessed_data/patients.csv')
+        cleaned = frame.dropna()
+        numeric = cleaned[['age', 'score']]
+        assert list(output.columns) == ['age', 'score', 'gene']
+        assert output['gene'].tolist() == cleaned['gene'].tolist()
+        np.testing.assert_allclose(
+            output[['age', 'score']].to_numpy(), ((numeric - numeric.mean()) / numeric.std()).to_numpy()
+        )
+
+    def test_large_output_is_uploaded_in_parts(self, s3, monkeypatch):
+        from services.preprocessing import main
+        monkeypatch.setattr(main, 'PART_SIZE', 5 * 1024 * 1024)
+        frame = pd.DataFrame({'notes': ['x' * 100] * 120_000})
+
+        main.upload_chunks(BUCKET, 'preprocessed_data/large.csv', (frame[start:start + 30_000] for start in range(0, len(frame), 30_000)))
+
+        head = s3.head_object(Bucket=BUCKET, Key='preprocessed_data/large.csv')
+        assert head['ETag'].strip('"').endswith('-2')
+        assert read_csv(s3, 'preprocessed_data/large.csv').equals(frame)
+
+    def test_failed_upload_is_aborted(self, s3):
+        from services.preprocessing.main import upload_chunks
+
+        def chunks():
+            yield pd.DataFrame({'a': [1, 2]})
+            raise ValueError("bad chunk")
+
+        with pytest.raises(ValueError):
+            upload_chunks(BUCKET, 'preprocessed_data/broken.csv', chunks())
+
+        assert s3.list_multipart_uploads(Bucket=BUCKET).get('Uploads', []) == []
+        assert 'Contents' not in s3.list_objects_v2(Bucket=BUCKET, Prefix='preprocessed_data/')
@@ -0,0 +1,93 @@
+import os
+import pickle
+import hashlib
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip('faiss')
+pytest.importorskip('langchain')
+pytest.importorskip('openai')
+
+from langchain.embeddings.base import Embeddings
+
+class HashEmbeddings(Embeddings):
+    """Deterministic embeddings that record every text sent for embedding"""
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts, chunk_size=0):
+        self.embedded.extend(texts)
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        seed = int(hashlib.md5(text.encode()).hexdigest()[:8], 16)
+        return np.random.default_rng(seed).normal(size=16).tolist()
+
+def make_patients(count: int, prefix: str = 'P'):
+    return [{'id': f'{prefix}{i:03d}', 'name': f'Patient {i}', 'age': 20 + i} for i in range(count)]
+
+@pytest.fixture
+def rag(monkeypatch, tmp_path):
+    """RAG pipeline module with an empty store, fake embeddings and a temporary index directory"""
+    os.environ.setdefault('OPENAI_API_KEY', 'test')
+    from services.rag_pipeline import main
+    monkeypatch.setattr(main, 'embeddings', HashEmbeddings())
+    monkeypatch.setattr(main, 'vector_store', None)
+    monkeypatch.setattr(main, 'row_hashes', {})
+    monkeypatch.setattr(main, 'INDEX_DIR', str(tmp_path / 'index'))
+    return main
+
+def indexed_ids(rag):
+    return sorted(rag.vector_store.index_to_docstore_id.values())
+
+def nearest_id(rag, patient):
+    return rag.vector_store.similarity_search(str(patient), k=1)[0].metadata['patient_id']
+
+@pytest.mark.unit
+class TestIncrementalIndex:
+    """Incremental FAISS index updates"""
+
+    def test_unchanged_patients_are_not_reembedded(self, rag):
+        patients = make_patients(3)
+        assert rag.apply_patient_changes(patients) == 3
+
+        assert rag.apply_patient_changes(patients) == 0
+        assert len(rag.embeddings.embedded) == 3
+        assert rag.vector_store.index.ntotal == 3
+
+    def test_changed_and_removed_patients(self, rag):
+        patients = make_patients(3)
+        rag.apply_patient_changes(patients)
+        changed = {**patients[1], 'age': 99}
+
+        assert rag.apply_patient_changes([changed], removed_ids=[patients[2]['id']]) == 1
+
+        assert rag.vector_store.index.ntotal == 2
+        assert indexed_ids(rag) == [patients[0]['id'], patients[1]['id']]
+        assert set(rag.row_hashes) == {patients[0]['id'], patients[1]['id']}
+        assert nearest_id(rag, changed) == changed['id']
+        assert rag.vector_store.docstore.search(changed['id']).page_content == str(changed)
+
+    def test_index_and_row_hashes_are_persisted(self, rag):
+        from langchain.vectorstores import FAISS
+        patients = make_patients(4)
+        rag.apply_patient_changes(patients)
+
+        loaded = FAISS.load_local(rag.INDEX_DIR, rag.embeddings)
+        with open(os.path.join(rag.INDEX_DIR, rag.ROW_HASHES_FILE), 'rb') as f:
+            assert pickle.load(f) == rag.row_hashes
+        assert loaded.index.ntotal == 4
+        assert loaded.similarity_search(str(patients[2]), k=1)[0].metadata['patient_id'] == patients[2]['id']
+
+    def test_large_index_switches_to_ivf_and_keeps_updating(self, rag, monkeypatch):
+        monkeypatch.setattr(rag, 'IVF_MIN_VECTORS', 50)
+        patients = make_patients(60)
+        rag.apply_patient_changes(patients)
+        assert isinstance(rag.vector_store.index, faiss.IndexIVFScalarQuantizer)
+
+        changed = {**patients[7], 'age': 1}
+        rag.apply_patient_changes([changed], removed_ids=[patients[8]['id']])
+
+        assert rag.vector_store.index.ntotal == 59
+        assert patients[8]['id'] not in indexed_ids(rag)
+        assert nearest_id(rag, changed) == changed['id']
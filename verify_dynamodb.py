@@ -3,6 +3,7 @@
 import boto3
 import logging
 import json
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from typing import Dict, Any, List
 import time
@@ -22,7 +23,8 @@ class DynamoDBVerifier:
         self.dynamodb = boto3.client(
             'dynamodb',
             endpoint_url=self.endpoint_url,
-            region_name=self.region
+            region_name=self.region,
+            config=Config(tcp_keepalive=True, retries={'mode': 'adaptive', 'max_attempts': 10})
         )
     
     def verify_table_exists(self, table_name: str) -> bool:
@@ -79,11 +81,17 @@ class DynamoDBVerifier:
             return False
     
     def verify_table_throughput(self, table_name: str) -> bool:
-        """Verify table throughput settings"""
+        """Verify table capacity: on-demand, or provisioned with capacity on both sides"""
         try:
-            response = self.dynamodb.describe_table(TableName=table_name)
-            throughput = response['Table']['ProvisionedThroughput']
+            table = self.dynamodb.describe_table(TableName=table_name)['Table']
+            # Tables created before on-demand billing have no summary and are provisioned
+            billing_mode = table.get('BillingModeSummary', {}).get('BillingMode', 'PROVISIONED')
+            logger.info(f"Table {table_name} billing mode: {billing_mode}")
+            
+            if billing_mode == 'PAY_PER_REQUEST':
+                return True
             
+            throughput = table['ProvisionedThroughput']
             return (
                 throughput['ReadCapacityUnits'] > 0 and
                 throughput['WriteCapacityUnits'] > 0